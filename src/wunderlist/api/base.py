@@ -1,11 +1,27 @@
+import atexit
 import json
+import threading
+import time
 
 import requests
+from requests import codes
+from requests.adapters import HTTPAdapter
 
 from wunderlist import config
-from wunderlist.auth import oauth_token
+from wunderlist.api import cache, circuit, deadline, metrics, retry, stream
+from wunderlist.auth import invalidate_token_cache, oauth_token
+
+# Requests made at the same time by the shared executor, which is also the
+# number of connections kept alive
+MAX_CONNECTIONS = 6
 
 _oauth_token = None
+_session = None
+_session_lock = threading.Lock()
+_executor = None
+
+# Jobs submitted to the shared executor that have not yet finished
+_pending = set()
 
 def _request_headers():
     global _oauth_token
@@ -21,6 +37,86 @@ def _request_headers():
         }
     return None
 
+def session():
+    """
+    Returns the keep-alive session shared by all threads in this process,
+    creating it on first use
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=MAX_CONNECTIONS)
+                s = requests.Session()
+                s.mount('https://', adapter)
+                s.mount('http://', adapter)
+                s.headers.update(_request_headers() or {})
+
+                _session = s
+
+    return _session
+
+def close():
+    """
+    Closes all pooled connections; the next request opens a new session
+    """
+    global _session, _oauth_token
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _oauth_token = None
+
+atexit.register(close)
+
+def executor():
+    """
+    Returns the thread pool shared by all requests made concurrently in this
+    process. Jobs must not wait on other jobs since the pool is bounded.
+    """
+    global _executor
+
+    if _executor is None:
+        with _session_lock:
+            if _executor is None:
+                from concurrent import futures
+
+                _executor = futures.ThreadPoolExecutor(max_workers=MAX_CONNECTIONS)
+
+    return _executor
+
+def submit(fn, *args, **kwargs):
+    """
+    Runs a function that makes requests on the shared executor. The job is
+    bound by the caller's deadline even if it only starts once the caller
+    has given up.
+    """
+    future = executor().submit(deadline.inherit(fn), *args, **kwargs)
+
+    _pending.add(future)
+    future.add_done_callback(_pending.discard)
+
+    return future
+
+def cancel_pending():
+    """
+    Cancels all jobs that have not yet started, e.g. once the sync that
+    needed them has failed
+    """
+    for future in list(_pending):
+        future.cancel()
+
+def get_many(paths, conditional=False, streamed=False):
+    """
+    Starts a GET for each (path, params) tuple and returns a future for each
+    response in the same order
+    """
+    return [submit(get, path, params, conditional=conditional, streamed=streamed)
+            for (path, params) in paths]
+
 def _report_errors(fn):
     def report_errors(*args, **kwargs):
         response = fn(*args, **kwargs)
@@ -29,46 +125,114 @@ def _report_errors(fn):
         return response
     return report_errors
 
-def get(path, params=None):
-    headers = _request_headers()
-    return requests.get(
-        config.WL_API_BASE_URL + '/' + path,
-        headers=headers,
-        params=params
-    )
+def _request(method, path, **kwargs):
+    url = config.WL_API_BASE_URL + '/' + path
+    start = time.time()
+
+    # Whether the last attempt had less time to connect than usual
+    shortened = [False]
+
+    def send():
+        timeout = deadline.timeout()
+        shortened[0] = timeout[0] < deadline.CONNECT_TIMEOUT
+
+        return session().request(method, url, timeout=timeout, **kwargs)
+
+    circuit.before_request()
+
+    try:
+        response = retry.call(method, path, send)
+    except (requests.RequestException, deadline.DeadlineExceeded) as e:
+        # A connection cut short by the deadline may just be slow
+        if isinstance(e, requests.ConnectionError) and \
+           not (isinstance(e, requests.Timeout) and shortened[0]):
+            circuit.record_failure()
+
+        metrics.record(method, path, 'error', time.time() - start, retries=getattr(e, 'retries', 0))
+        raise
+
+    circuit.record_success()
+
+    # The token was revoked or replaced; read it again from the Keychain
+    if response.status_code == codes.unauthorized:
+        invalidate_token_cache()
+        close()
+
+    # The size of a streamed response is added as it is read
+    size = 0 if kwargs.get('stream') else len(response.content)
+    response.metrics = metrics.record(method, path, response.status_code,
+                                      time.time() - start, size, response.retries)
+
+    return response
+
+@_report_errors
+def get(path, params=None, conditional=False, streamed=False):
+    """
+    Performs a GET request. With conditional set, the response is revalidated
+    against the on-disk cache and the cached body is used if the server
+    responds 304 Not Modified; response.validator then identifies the
+    version of the body. With streamed set, the body is not downloaded until
+    it is read, e.g. with iter_json.
+    """
+    entry = cache.lookup(path, params) if conditional else None
+    response = _request('GET', path,
+                        params=params,
+                        headers=cache.validator_headers(entry),
+                        stream=streamed)
+
+    if conditional:
+        if response.status_code == codes.not_modified and entry:
+            response.close()
+            response.status_code = codes.ok
+            response._content = entry['body']
+            response._content_consumed = True
+            response.from_cache = True
+            response.validator = entry['validator']
+        elif response.status_code == codes.ok:
+            response.validator = cache.validator(response)
+
+            if streamed:
+                # Cached as the body is read by iter_json
+                response.cache_key = (path, params)
+            else:
+                cache.store(path, params, response)
+
+    return response
+
+def _measure(response, chunks):
+    sample = getattr(response, 'metrics', None)
+
+    for chunk in chunks:
+        if sample and not getattr(response, 'from_cache', False):
+            metrics.add_bytes(sample, len(chunk))
+        # Reading the body is bounded by the budget too, not just each read
+        deadline.check()
+        yield chunk
+
+def iter_json(response):
+    """
+    Yields each item of a JSON array response as soon as it is received
+    """
+    chunks = _measure(response, response.iter_content(stream.CHUNK_SIZE))
+    cache_key = getattr(response, 'cache_key', None)
+
+    if cache_key:
+        chunks = cache.store_stream(cache_key[0], cache_key[1], response, chunks)
+
+    return stream.iter_array(chunks)
 
 @_report_errors
 def post(path, data=None):
-    headers = _request_headers()
-    return requests.post(
-        config.WL_API_BASE_URL + '/' + path,
-        headers=headers,
-        data=json.dumps(data)
-    )
+    return _request('POST', path, data=json.dumps(data))
 
 @_report_errors
 def put(path, data=None):
-    headers = _request_headers()
-    return requests.put(
-        config.WL_API_BASE_URL + '/' + path,
-        headers=headers,
-        data=json.dumps(data)
-    )
+    return _request('PUT', path, data=json.dumps(data))
 
 @_report_errors
 def patch(path, data=None):
-    headers = _request_headers()
-    return requests.patch(
-        config.WL_API_BASE_URL + '/' + path,
-        headers=headers,
-        data=json.dumps(data)
-    )
+    return _request('PATCH', path, data=json.dumps(data))
 
 @_report_errors
 def delete(path, data=None):
-    headers = _request_headers()
-    return requests.delete(
-        config.WL_API_BASE_URL + '/' + path,
-        headers=headers,
-        params=data
-    )
+    return _request('DELETE', path, params=data)
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from wunderlist.util import workflow, NullHandler
+
+log = logging.getLogger(__name__)
+log.addHandler(NullHandler())
+
+# Least recently used responses are removed once the cache exceeds this size
+MAX_CACHE_SIZE = 20 * 1024 * 1024
+
+_lock = threading.Lock()
+_cache_size = None
+
+
+def _cache_dir():
+    path = workflow().cachefile('http')
+
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            pass
+
+    return path
+
+
+def _entry_path(path, params):
+    key = json.dumps([path, sorted((params or {}).items())])
+
+    return os.path.join(_cache_dir(), hashlib.sha1(key).hexdigest())
+
+
+def _entries():
+    cache_dir = _cache_dir()
+    entries = []
+
+    for filename in os.listdir(cache_dir):
+        entry_path = os.path.join(cache_dir, filename)
+        try:
+            stat = os.stat(entry_path)
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        except OSError:
+            pass
+
+    return entries
+
+
+def _evict(added_size):
+    global _cache_size
+
+    with _lock:
+        if _cache_size is None:
+            _cache_size = sum(size for (_, size, _) in _entries())
+        else:
+            _cache_size += added_size
+
+        if _cache_size <= MAX_CACHE_SIZE:
+            return
+
+        entries = sorted(_entries())
+        _cache_size = sum(size for (_, size, _) in entries)
+
+        for (_, size, entry_path) in entries:
+            if _cache_size <= MAX_CACHE_SIZE:
+                break
+            try:
+                os.remove(entry_path)
+                _cache_size -= size
+                log.debug('Evicted cached response %s', entry_path)
+            except OSError:
+                pass
+
+
+def lookup(path, params=None):
+    """
+    Returns the cached validators and body for the request, or None if the
+    response has not been cached
+    """
+    entry_path = _entry_path(path, params)
+
+    try:
+        with open(entry_path, 'rb') as f:
+            validator = f.readline().rstrip('\n')
+            validators = json.loads(validator)
+            body = f.read()
+    except (IOError, ValueError):
+        return None
+
+    # Mark the entry as recently used
+    try:
+        os.utime(entry_path, None)
+    except OSError:
+        pass
+
+    validators['validator'] = validator
+    validators['body'] = body
+
+    return validators
+
+
+def validator_headers(entry):
+    headers = {}
+
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    return headers
+
+
+def validator(response):
+    """
+    Identifies the version of the response body, or None if the server did
+    not provide any validators
+    """
+    etag = response.headers.get('etag')
+    last_modified = response.headers.get('last-modified')
+
+    if not etag and not last_modified:
+        return None
+
+    return json.dumps({
+        'etag': etag,
+        'last_modified': last_modified
+    })
+
+
+def _write(path, params, validators, chunks):
+    """
+    Passes through each chunk while writing it to a temporary file that
+    replaces the existing entry once every chunk has been written
+    """
+    entry_path = _entry_path(path, params)
+    temp_path = '%s.%d.%d' % (entry_path, os.getpid(), threading.current_thread().ident)
+    size = len(validators) + 1
+    f = None
+
+    try:
+        f = open(temp_path, 'wb')
+        f.write(validators + '\n')
+    except IOError:
+        log.exception('Unable to cache the response for %s', path)
+        f = None
+
+    try:
+        for chunk in chunks:
+            if f:
+                try:
+                    f.write(chunk)
+                    size += len(chunk)
+                except IOError:
+                    log.exception('Unable to cache the response for %s', path)
+                    f.close()
+                    f = None
+            yield chunk
+
+        if f:
+            f.close()
+            try:
+                os.rename(temp_path, entry_path)
+                _evict(size)
+            except OSError:
+                log.exception('Unable to cache the response for %s', path)
+    finally:
+        if f and not f.closed:
+            f.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def store(path, params, response):
+    """
+    Saves the response body along with its validators if the server provided
+    any, otherwise the response cannot be revalidated and is not cached
+    """
+    validators = validator(response)
+
+    if validators:
+        for _ in _write(path, params, validators, [response.content]):
+            pass
+
+
+def store_stream(path, params, response, chunks):
+    """
+    Passes through the chunks of a streamed response body, caching it once
+    the final chunk has been read
+    """
+    validators = validator(response)
+
+    if not validators:
+        return chunks
+
+    return _write(path, params, validators, chunks)
+
+
+def clear():
+    global _cache_size
+
+    with _lock:
+        for (_, _, entry_path) in _entries():
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+        _cache_size = 0
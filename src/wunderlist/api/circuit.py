@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from requests.exceptions import ConnectionError
+
+from wunderlist.util import workflow, NullHandler
+
+log = logging.getLogger(__name__)
+log.addHandler(NullHandler())
+
+# Consecutive connection failures, across processes, that open the circuit
+FAILURE_THRESHOLD = 3
+
+# Seconds that requests are refused once the circuit opens before a single
+# probe request is allowed through
+COOLDOWN = 60
+
+# Cooldown doubles after each failed probe, up to this limit
+MAX_COOLDOWN = 15 * 60
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+_lock = threading.Lock()
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Raised instead of attempting a request while the network is thought to
+    be unreachable
+    """
+    pass
+
+
+def _state_file():
+    return workflow().cachefile('circuit.json')
+
+
+def _load():
+    try:
+        with open(_state_file(), 'rb') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {'failures': 0, 'opened_at': None, 'cooldown': COOLDOWN}
+
+
+def _save(circuit):
+    path = _state_file()
+    temp_path = '%s.%d' % (path, os.getpid())
+
+    try:
+        with open(temp_path, 'wb') as f:
+            json.dump(circuit, f)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        log.exception('Unable to save the circuit state')
+
+
+def _state(circuit, now=None):
+    if circuit['opened_at'] is None:
+        return CLOSED
+    if (now or time.time()) - circuit['opened_at'] < circuit['cooldown']:
+        return OPEN
+    return HALF_OPEN
+
+
+def state():
+    return _state(_load())
+
+
+def is_open():
+    """
+    True if requests would currently be refused; during the half-open state
+    a probe may be attempted, e.g. by a background sync
+    """
+    return state() == OPEN
+
+
+def before_request():
+    """
+    Refuses the request immediately while the circuit is open
+    """
+    circuit = _load()
+
+    if _state(circuit) == OPEN:
+        raise CircuitOpenError('Wunderlist is unreachable, retrying in %ds' % (
+            circuit['opened_at'] + circuit['cooldown'] - time.time()))
+
+
+def record_success():
+    # Avoid writing the state file for every request when nothing changed
+    with _lock:
+        circuit = _load()
+
+        if circuit['failures'] or circuit['opened_at'] is not None:
+            if circuit['opened_at'] is not None:
+                log.info('Wunderlist is reachable again, closing the circuit')
+
+            _save({'failures': 0, 'opened_at': None, 'cooldown': COOLDOWN})
+
+
+def record_failure():
+    with _lock:
+        circuit = _load()
+        now = time.time()
+        current_state = _state(circuit, now)
+
+        circuit['failures'] += 1
+
+        if current_state == HALF_OPEN:
+            # The probe failed, wait longer before the next one
+            circuit['opened_at'] = now
+            circuit['cooldown'] = min(MAX_COOLDOWN, circuit['cooldown'] * 2)
+            log.info('Probe failed, circuit open for %ds', circuit['cooldown'])
+        elif current_state == CLOSED and circuit['failures'] >= FAILURE_THRESHOLD:
+            circuit['opened_at'] = now
+            circuit['cooldown'] = COOLDOWN
+            log.info('%d consecutive connection failures, circuit open for %ds',
+                     circuit['failures'], circuit['cooldown'])
+
+        _save(circuit)
+
+
+def reset():
+    with _lock:
+        _save({'failures': 0, 'opened_at': None, 'cooldown': COOLDOWN})
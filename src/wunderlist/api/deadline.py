@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+import threading
+import time
+
+# Applied to every request so that a hung connection cannot block forever
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+
+# The deadline is shared by all threads because each workflow process serves
+# a single Alfred query; requests made by sync worker threads on behalf of a
+# handler must inherit its budget
+_deadline = None
+
+# Jobs run on a thread pool keep the deadline of the thread that submitted
+# them, even once that thread's budget has ended
+_inherited = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextmanager
+def budget(seconds):
+    """
+    Limits all network calls made within the block to the given number of
+    seconds in total. Nested budgets can only shorten the deadline.
+    """
+    previous = _current()
+    deadline = time.time() + seconds
+
+    if previous is not None and previous < deadline:
+        deadline = previous
+
+    _set(deadline)
+
+    try:
+        yield
+    finally:
+        _set(previous)
+
+
+def _current():
+    return getattr(_inherited, 'deadline', _deadline)
+
+
+def _set(deadline):
+    global _deadline
+
+    if hasattr(_inherited, 'deadline'):
+        _inherited.deadline = deadline
+    else:
+        _deadline = deadline
+
+
+def inherit(fn):
+    """
+    Wraps the function to run with the current deadline on whichever thread
+    calls it
+    """
+    deadline = _current()
+
+    def run(*args, **kwargs):
+        missing = object()
+        previous = getattr(_inherited, 'deadline', missing)
+        _inherited.deadline = deadline
+
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if previous is missing:
+                del _inherited.deadline
+            else:
+                _inherited.deadline = previous
+
+    return run
+
+
+def remaining():
+    """
+    Seconds left in the current budget, or None if there is no budget
+    """
+    deadline = _current()
+
+    if deadline is None:
+        return None
+
+    return deadline - time.time()
+
+
+def expired():
+    left = remaining()
+
+    return left is not None and left <= 0
+
+
+def check():
+    if expired():
+        raise DeadlineExceeded()
+
+
+def timeout():
+    """
+    The (connect, read) timeout for a request, bounded by the remaining
+    budget
+    """
+    left = remaining()
+
+    if left is None:
+        return (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+    if left <= 0:
+        raise DeadlineExceeded()
+
+    return (min(CONNECT_TIMEOUT, left), min(READ_TIMEOUT, left))
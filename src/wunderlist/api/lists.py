@@ -1,7 +1,6 @@
 import logging
 import time
 
-from concurrent import futures
 from requests import codes
 
 import wunderlist.api.base as api
@@ -16,33 +15,35 @@ SMART_LISTS = [
 
 def lists(order='display', task_counts=False):
     start = time.time()
-    req = api.get('lists')
     lists = []
     positions = []
 
     if order == 'display':
-        with futures.ThreadPoolExecutor(max_workers=2) as executor:
-            def get_tasks():
-                lists.extend(req.json())
+        (lists_job, positions_job) = api.get_many([
+            ('lists', None),
+            ('list_positions', None)
+        ], conditional=True)
 
-            def get_positions():
-                positions.extend(task_positions(list_id))
+        lists = lists_job.result().json()
+        positions_data = positions_job.result().json()
 
-            executor.submit(get_tasks)
-            executor.submit(get_positions)
+        if len(positions_data) > 0:
+            positions = positions_data[0]['values']
+
+        position_by_list_id = dict((id, index) for (index, id) in enumerate(positions))
 
         def position(list):
             if list['list_type'] in SMART_LISTS:
                 return SMART_LISTS.index(list['list_type'])
-            elif list['id'] in positions:
-                return positions.index(list['id']) + len(SMART_LISTS)
+            elif list['id'] in position_by_list_id:
+                return position_by_list_id[list['id']] + len(SMART_LISTS)
             else:
                 return list['id']
 
         log.info('Retrieved lists and positions in %s', time.time() - start)
         lists.sort(key=position)
     else:
-        lists = req.json()
+        lists = api.get('lists', conditional=True).json()
         log.info('Retrieved lists in %s', time.time() - start)
 
     if task_counts:
@@ -0,0 +1,123 @@
+import atexit
+import re
+import threading
+import time
+
+from wunderlist.util import workflow
+
+# Samples older than this or beyond the most recent MAX_SAMPLES are dropped
+# when the metrics are saved
+WINDOW_SECONDS = 7 * 24 * 60 * 60
+MAX_SAMPLES = 5000
+
+_id_pattern = re.compile(r'/\d+(?=/|$)')
+
+# Indexes of the values in each sample
+TIMESTAMP, ENDPOINT, STATUS, LATENCY, BYTES, RETRIES = range(6)
+
+_samples = []
+_lock = threading.Lock()
+
+
+def endpoint(method, path):
+    """
+    Groups requests for individual resources, e.g. PATCH tasks/:id
+    """
+    return '%s %s' % (method.upper(), _id_pattern.sub('/:id', path))
+
+
+def record(method, path, status, latency, size=0, retries=0):
+    """
+    Records a completed request and returns the sample so that the size of
+    a streamed response can be added once it has been read
+    """
+    sample = [time.time(), endpoint(method, path), status, latency, size, retries]
+
+    with _lock:
+        _samples.append(sample)
+
+    return sample
+
+
+def add_bytes(sample, size):
+    sample[BYTES] += size
+
+
+def _stored_samples():
+    return workflow().stored_data('api_metrics') or []
+
+
+def samples():
+    """
+    All persisted samples within the window plus those from this process
+    """
+    with _lock:
+        return _stored_samples() + list(_samples)
+
+
+def save():
+    global _samples
+
+    with _lock:
+        if not _samples:
+            return
+
+        cutoff = time.time() - WINDOW_SECONDS
+        all_samples = [s for s in _stored_samples() + _samples if s[TIMESTAMP] >= cutoff]
+
+        workflow().store_data('api_metrics', all_samples[-MAX_SAMPLES:])
+        _samples = []
+
+atexit.register(save)
+
+
+def clear():
+    global _samples
+
+    with _lock:
+        _samples = []
+        workflow().store_data('api_metrics', None)
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0
+
+    index = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+
+    return sorted_values[index]
+
+
+def summary(all_samples=None):
+    """
+    Per-endpoint statistics ordered by total time spent, slowest first
+    """
+    by_endpoint = {}
+
+    for sample in (samples() if all_samples is None else all_samples):
+        by_endpoint.setdefault(sample[ENDPOINT], []).append(sample)
+
+    stats = []
+
+    for (name, endpoint_samples) in by_endpoint.iteritems():
+        latencies = sorted(s[LATENCY] for s in endpoint_samples)
+        statuses = {}
+
+        for s in endpoint_samples:
+            statuses[s[STATUS]] = statuses.get(s[STATUS], 0) + 1
+
+        stats.append({
+            'endpoint': name,
+            'count': len(endpoint_samples),
+            'total_time': sum(latencies),
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'p99': _percentile(latencies, 99),
+            'bytes': sum(s[BYTES] for s in endpoint_samples),
+            'retries': sum(s[RETRIES] for s in endpoint_samples),
+            'statuses': statuses
+        })
+
+    stats.sort(key=lambda s: -s['total_time'])
+
+    return stats
@@ -5,7 +5,7 @@ import wunderlist.api.base as api
 
 NO_CHANGE = '!nochange!'
 
-def reminders(list_id=None, task_id=None, completed=False):
+def reminders(list_id=None, task_id=None, completed=False, streamed=False):
     data = {
         'completed': completed
     }
@@ -13,11 +13,36 @@ def reminders(list_id=None, task_id=None, completed=False):
         data['list_id'] = int(list_id)
     elif task_id:
         data['task_id'] = int(task_id)
-    req = api.get('reminders', data)
+    req = api.get('reminders', data, conditional=True, streamed=streamed)
+
+    if streamed:
+        return api.iter_json(req)
+
     reminders = req.json()
 
     return reminders
 
+def request_reminders(list_id, saved_validator=None):
+    """
+    Starts retrieving the reminders in a list on the shared executor. The
+    result of the future is the response validator and the list of
+    reminders, or None instead of the reminders if they are the same as when
+    saved_validator was received. Like tasks.request_tasks, the response is
+    read in full so that it does not hold a connection while waiting to be
+    saved.
+    """
+    def fetch():
+        req = api.get('reminders', {'list_id': int(list_id), 'completed': False},
+                      conditional=True)
+        validator = getattr(req, 'validator', None)
+
+        if validator and validator == saved_validator:
+            return (validator, None)
+
+        return (validator, req.json())
+
+    return api.submit(fetch)
+
 def reminder(id):
     req = api.get('reminders/' + id)
     info = req.json()
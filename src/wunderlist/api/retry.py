@@ -0,0 +1,221 @@
+from email.utils import mktime_tz, parsedate_tz
+import logging
+import random
+import threading
+import time
+
+from requests import codes
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+
+from wunderlist.api import deadline
+from wunderlist.util import NullHandler
+
+log = logging.getLogger(__name__)
+log.addHandler(NullHandler())
+
+# Shared by every thread in the process so that sync fan-out cannot exceed
+# the rate at which the API is willing to serve requests
+REQUESTS_PER_SECOND = 10
+BURST_SIZE = 20
+
+# Longest wait that will be honored from a Retry-After header; anything
+# longer is reported to the caller instead
+MAX_RETRY_AFTER = 30
+
+RETRY_STATUSES = (
+    codes.too_many_requests,
+    codes.internal_server_error,
+    codes.bad_gateway,
+    codes.service_unavailable,
+    codes.gateway_timeout
+)
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket; acquire() blocks until a request may be sent
+    or raises DeadlineExceeded once the deadline of the caller has passed
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated_at = time.time()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = max(0, now - max(self._updated_at, self._paused_until))
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        while True:
+            deadline.check()
+
+            with self._lock:
+                now = time.time()
+
+                if now >= self._paused_until:
+                    self._refill(now)
+
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    wait = self._paused_until - now
+
+            time_left = deadline.remaining()
+
+            if time_left is not None:
+                wait = max(0, min(wait, time_left))
+
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Stops all threads from sending requests, e.g. when throttled
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
+            self._tokens = 0
+
+
+class RetryPolicy(object):
+
+    def __init__(self, max_attempts=4, backoff=0.5, max_backoff=8, idempotent=True):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idempotent = idempotent
+
+    def should_retry(self, attempt, response=None, error=None):
+        if attempt >= self.max_attempts:
+            return False
+
+        if error is not None:
+            # The request never reached the server so it is always safe to
+            # send it again
+            if isinstance(error, ConnectTimeout):
+                return True
+            return self.idempotent and isinstance(error, (ConnectionError, Timeout))
+
+        delay = retry_after(response)
+        if delay is not None and delay > MAX_RETRY_AFTER:
+            return False
+
+        if response.status_code == codes.too_many_requests:
+            return True
+
+        return self.idempotent and response.status_code in RETRY_STATUSES
+
+    def delay(self, attempt, response=None):
+        """
+        Exponential backoff with full jitter unless the server asked for a
+        specific delay
+        """
+        delay = retry_after(response) if response is not None else None
+
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+        return delay
+
+
+# Endpoint-specific overrides keyed by (method, endpoint)
+_policies = {
+    # Used to decide whether to sync at all, a quick answer is preferable to
+    # a persistent one
+    ('GET', 'root'): RetryPolicy(max_attempts=2)
+}
+
+_bucket = TokenBucket(REQUESTS_PER_SECOND, BURST_SIZE)
+
+
+def endpoint(path):
+    """
+    The resource name of a path, e.g. tasks for tasks/1234
+    """
+    return path.split('/', 1)[0]
+
+
+def policy(method, path):
+    method = method.upper()
+
+    return _policies.get(
+        (method, endpoint(path)),
+        RetryPolicy(idempotent=method in IDEMPOTENT_METHODS)
+    )
+
+
+def retry_after(response):
+    value = response.headers.get('retry-after')
+
+    if value is None:
+        return None
+
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+
+    date = parsedate_tz(value)
+    if date:
+        return max(0, mktime_tz(date) - time.time())
+
+    return None
+
+
+def call(method, path, send):
+    """
+    Sends the request with send() under the shared rate limit, retrying
+    according to the policy for the endpoint
+    """
+    request_policy = policy(method, path)
+    attempt = 0
+
+    while True:
+        response = None
+        error = None
+        attempt += 1
+
+        _bucket.acquire()
+
+        try:
+            response = send()
+        except (ConnectionError, Timeout) as e:
+            error = e
+
+        delay = None
+
+        if request_policy.should_retry(attempt, response=response, error=error):
+            delay = request_policy.delay(attempt, response=response)
+            time_left = deadline.remaining()
+
+            # Do not retry if the caller would have given up by then
+            if time_left is not None and delay >= time_left:
+                delay = None
+
+        if delay is None:
+            if error is not None:
+                error.retries = attempt - 1
+                raise error
+            response.retries = attempt - 1
+            return response
+
+        if response is not None and response.status_code == codes.too_many_requests:
+            _bucket.pause(delay)
+
+        log.info('Retrying %s %s in %.2fs (attempt %d): %s', method.upper(), path, delay, attempt,
+                 error if error is not None else response.status_code)
+
+        # A streamed response holds its connection until it is closed
+        if response is not None:
+            response.close()
+
+        time.sleep(delay)
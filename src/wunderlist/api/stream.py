@@ -0,0 +1,70 @@
+import codecs
+import json
+
+# Large enough to hold many tasks per read while keeping the undecoded
+# portion of the response small
+CHUNK_SIZE = 16 * 1024
+
+_whitespace = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+def iter_array(chunks):
+    """
+    Incrementally decodes a JSON array from an iterable of byte strings,
+    yielding each element as soon as it has been received in full
+    """
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf = u''
+    pos = 0
+    started = False
+    exhausted = False
+
+    def skip(buf, pos, characters):
+        while pos < len(buf) and buf[pos] in characters:
+            pos += 1
+        return pos
+
+    while True:
+        pos = skip(buf, pos, _whitespace + (',' if started else ''))
+
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError('Expected a JSON array')
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == ']':
+                # Read to the end so that the connection is released
+                for _ in chunks:
+                    pass
+                return
+
+            try:
+                item, end = _decoder.raw_decode(buf, pos)
+
+                # A number at the end of the buffer may be incomplete
+                if end < len(buf) or exhausted:
+                    pos = end
+                    yield item
+                    continue
+            except ValueError:
+                if exhausted:
+                    raise
+
+        if exhausted:
+            raise ValueError('Unexpected end of JSON array')
+
+        # Read more data, discarding anything that was already decoded
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            chunk = b''
+            exhausted = True
+
+        buf = buf[pos:] + text_decoder.decode(chunk, final=exhausted)
+        pos = 0
+
@@ -11,14 +11,13 @@ log.addHandler(NullHandler())
 
 NO_CHANGE = '!nochange!'
 
-def tasks(list_id, completed=False, subtasks=False, positions=None):
-    start = time.time()
-    req = api.get(('subtasks' if subtasks else 'tasks'), {
+def _get_tasks(list_id, completed, subtasks):
+    return api.get(('subtasks' if subtasks else 'tasks'), {
         'list_id': int(list_id),
         'completed': completed
-    })
-    tasks = []
-    positions = []
+    }, conditional=True)
+
+def _task_type(completed, subtasks):
     task_type = ''
 
     if completed:
@@ -26,33 +25,87 @@ def tasks(list_id, completed=False, subtasks=False, positions=None):
     if subtasks:
         task_type += 'sub'
 
+    return task_type
+
+def tasks(list_id, completed=False, subtasks=False, positions=None):
+    start = time.time()
+    req = _get_tasks(list_id, completed, subtasks)
+    tasks = []
+    task_type = _task_type(completed, subtasks)
+
     tasks = req.json()
     log.info('Retrieved %stasks for list %d in %s', task_type, list_id, time.time() - start)
 
     return tasks
 
-def task_positions(list_id):
-    start = time.time()
-    positions = []
+def request_tasks(list_id, completed=False, subtasks=False, saved_validator=None):
+    """
+    Starts retrieving tasks on the shared executor. The result of the future
+    is the response validator and the list of tasks, or None instead of the
+    tasks if they are the same as when saved_validator was received.
+
+    The response is read in full on the executor rather than streamed: the
+    lists are saved one at a time by a single writer, so a stream handed to
+    it would hold its pooled connection open and keep the other downloads
+    waiting until the writer got to that list.
+    """
+    def fetch():
+        start = time.time()
+        task_type = _task_type(completed, subtasks)
+        req = _get_tasks(list_id, completed, subtasks)
+        validator = getattr(req, 'validator', None)
+
+        if validator and validator == saved_validator:
+            log.info('The %stasks for list %d are unchanged', task_type, list_id)
 
-    from concurrent import futures
+            return (validator, None)
 
-    with futures.ThreadPoolExecutor(max_workers=2) as executor:
-        jobs = (
-            executor.submit(api.get, 'task_positions', {'list_id': list_id}),
-            executor.submit(api.get, 'subtask_positions', {'list_id': list_id})
-        )
+        tasks = req.json()
+        log.info('Retrieved %d %stasks for list %d in %s', len(tasks), task_type, list_id, time.time() - start)
 
-        for job in futures.as_completed(jobs):
-            req = job.result()
-            data = req.json()
+        return (validator, tasks)
 
-            if len(data) > 0:
-                positions += data[0]['values']
+    return api.submit(fetch)
+
+def request_task_positions(list_id, subtasks=True):
+    """
+    Starts retrieving task and, optionally, subtask positions on the shared
+    executor; pass the futures to task_positions
+    """
+    requests = [('task_positions', {'list_id': list_id})]
+
+    if subtasks:
+        requests.append(('subtask_positions', {'list_id': list_id}))
+
+    return api.get_many(requests, conditional=True)
+
+def request_subtask_positions(list_id):
+    return api.get_many([
+        ('subtask_positions', {'list_id': list_id})
+    ], conditional=True)
+
+def task_positions(list_id, jobs=None):
+    """
+    Returns the index of each task and subtask among its siblings along with
+    a revision that changes whenever any of the positions change
+    """
+    start = time.time()
+    position_by_task_id = {}
+    revisions = []
+
+    # Subtask positions are a separate object for each parent task
+    for job in (jobs or request_task_positions(list_id)):
+        req = job.result()
+
+        for positions in req.json():
+            revisions.append('%s:%s' % (positions['id'], positions['revision']))
+
+            for (index, task_id) in enumerate(positions['values']):
+                position_by_task_id[task_id] = index
 
     log.info('Retrieved task positions for list %d in %s', list_id, time.time() - start)
 
-    return positions
+    return (','.join(revisions), position_by_task_id)
 
 def task(id):
     req = api.get('tasks/%d' % int(id))
@@ -112,7 +165,7 @@ def update_task(id, revision, title=NO_CHANGE, assignee_id=NO_CHANGE, recurrence
         elif value != NO_CHANGE:
             params[key] = value
 
-    if due_date:
+    if due_date and due_date != NO_CHANGE:
         params['due_date'] = due_date.strftime('%Y-%m-%d')
 
     if remove:
@@ -1,9 +1,93 @@
+import os
+
 from workflow import PasswordNotFound
 
 from wunderlist import config
 from wunderlist.util import relaunch_alfred, workflow
 
 
+class FileTokenCache(object):
+    """
+    Keeps the token in a file readable only by the current user so that
+    the Keychain does not need to be queried by every workflow process
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+
+    @property
+    def path(self):
+        return self._path or workflow().datafile('.oauth_token')
+
+    def get(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read() or None
+        except IOError:
+            return None
+
+    def set(self, token):
+        temp_path = '%s.%d' % (self.path, os.getpid())
+
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(token)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError):
+            pass
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class MemoryTokenCache(object):
+    """
+    Keeps the token for the lifetime of the process
+    """
+
+    def __init__(self):
+        self._token = None
+
+    def get(self):
+        return self._token
+
+    def set(self, token):
+        self._token = token
+
+    def clear(self):
+        self._token = None
+
+
+_token_cache = None
+
+
+def token_cache():
+    global _token_cache
+
+    if _token_cache is None:
+        _token_cache = FileTokenCache()
+
+    return _token_cache
+
+
+def set_token_cache(cache):
+    global _token_cache
+
+    _token_cache = cache
+
+
+def invalidate_token_cache():
+    """
+    Forces the next call to oauth_token to read the token from the Keychain,
+    e.g. when the cached token has been rejected
+    """
+    token_cache().clear()
+
+
 def authorize():
     from multiprocessing import Process
     import urllib
@@ -28,6 +112,8 @@ def authorize():
 
 
 def deauthorize():
+    invalidate_token_cache()
+
     try:
         workflow().delete_password(config.KC_OAUTH_TOKEN)
     except PasswordNotFound:
@@ -64,10 +150,18 @@ def handle_authorization_url(url):
 
 
 def oauth_token():
-    try:
-        return workflow().get_password(config.KC_OAUTH_TOKEN)
-    except PasswordNotFound:
-        return None
+    cache = token_cache()
+    token = cache.get()
+
+    if token is None:
+        try:
+            token = workflow().get_password(config.KC_OAUTH_TOKEN)
+        except PasswordNotFound:
+            return None
+
+        cache.set(token)
+
+    return token
 
 
 def client_id():
@@ -114,6 +208,7 @@ def resolve_oauth_token(code):
 
     workflow().save_password(config.KC_OAUTH_TOKEN, token_info['access_token'])
     workflow().delete_password(config.KC_OAUTH_STATE)
+    token_cache().set(token_info['access_token'])
 
 
 def await_token():
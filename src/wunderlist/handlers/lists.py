@@ -16,12 +16,12 @@ def filter(args):
     )
 
 def commit(args, modifier=None):
-    from wunderlist.api import lists
+    from wunderlist.models.mutation import Mutation, CREATE_LIST
     from wunderlist.sync import background_sync
 
     list_name = _list_name(args)
 
-    lists.create_list(list_name)
+    Mutation.enqueue(CREATE_LIST, title=list_name)
 
     print 'The new list was created'
 
@@ -149,7 +149,7 @@ def filter(args):
         wf.add_item('Main menu', autocomplete='', icon=icons.BACK)
 
 def commit(args, modifier=None):
-    from wunderlist.api import tasks
+    from wunderlist.models.mutation import Mutation, CREATE_TASK
     from wunderlist.sync import background_sync
 
     task = _task(args)
@@ -157,15 +157,24 @@ def commit(args, modifier=None):
 
     prefs.last_list_id = task.list_id
 
-    task_info = tasks.create_task(task.list_id, task.title,
-                                  assignee_id=task.assignee_id,
-                                  recurrence_type=task.recurrence_type,
-                                  recurrence_count=task.recurrence_count,
-                                  due_date=task.due_date,
-                                  reminder_date=task.reminder_date,
-                                  starred=task.starred,
-                                  completed=task.completed,
-                                  note=task.note)
+    params = dict(list_id=task.list_id, title=task.title,
+                  assignee_id=task.assignee_id,
+                  recurrence_type=task.recurrence_type,
+                  recurrence_count=task.recurrence_count,
+                  due_date=task.due_date,
+                  reminder_date=task.reminder_date,
+                  starred=task.starred,
+                  completed=task.completed,
+                  note=task.note)
+
+    # Opening the task in Wunderlist requires its ID, so it must be created
+    # right away rather than when the outbox is flushed
+    if modifier == 'alt':
+        from wunderlist.api import tasks
+
+        task_info = tasks.create_task(**params)
+    else:
+        Mutation.enqueue(CREATE_TASK, **params)
 
     # Output must be a UTF-8 encoded string
     print ('The task was added to ' + task.list_title).encode('utf-8')
@@ -37,10 +37,66 @@ def _format_time_offset(t):
 
     return ' '.join(offset)
 
+def _format_completed_tasks_window(days):
+    if not days:
+        return 'all completed tasks'
+    elif days == 1:
+        return 'tasks completed in the past day'
+
+    return 'tasks completed in the past %d days' % days
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return '%d %s' % (size, unit)
+        size /= 1024.0
+
+    return '%.1f GB' % size
+
+def _format_ms(seconds):
+    return '%dms' % (seconds * 1000)
+
 def filter(args):
     prefs = Preferences.current_prefs()
 
-    if 'reminder' in args:
+    if 'diagnostics' in args:
+        from wunderlist.api import metrics
+
+        stats = metrics.summary()
+
+        if not stats:
+            workflow().add_item(
+                'No requests have been recorded',
+                'Network activity will appear here after the next sync',
+                icon=icons.INFO
+            )
+
+        for endpoint_stats in stats:
+            statuses = u'  '.join(u'%s×%d' % (status, count) for (status, count) in sorted(endpoint_stats['statuses'].items()))
+
+            workflow().add_item(
+                u'%s    %d requests, %.1fs total' % (endpoint_stats['endpoint'], endpoint_stats['count'], endpoint_stats['total_time']),
+                u'p50 %s  p95 %s  p99 %s    %s    %s    %d retries' % (
+                    _format_ms(endpoint_stats['p50']),
+                    _format_ms(endpoint_stats['p95']),
+                    _format_ms(endpoint_stats['p99']),
+                    _format_bytes(endpoint_stats['bytes']),
+                    statuses,
+                    endpoint_stats['retries']),
+                icon=icons.INFO
+            )
+
+        workflow().add_item(
+            'Reset diagnostics',
+            'Clear the recorded network activity',
+            arg='-pref diagnostics', valid=True, icon=icons.TRASH
+        )
+
+        workflow().add_item(
+            'Back',
+            autocomplete='-pref', icon=icons.BACK
+        )
+    elif 'reminder' in args:
         reminder_time = _parse_time(' '.join(args))
 
         if reminder_time is not None:
@@ -98,6 +154,48 @@ def filter(args):
             arg='-pref reminder_today disabled', valid=True, icon=icons.CANCEL
         )
 
+        workflow().add_item(
+            'Cancel',
+            autocomplete='-pref', icon=icons.BACK
+        )
+    elif 'completed_tasks_window' in args:
+        days = args[2] if len(args) > 2 else ''
+
+        if days.isdigit():
+            workflow().add_item(
+                'Change the completed tasks to keep',
+                'Keep %s' % _format_completed_tasks_window(int(days)),
+                arg='-pref completed_tasks_window %d' % int(days), valid=True, icon=icons.TASK_COMPLETED
+            )
+        else:
+            workflow().add_item(
+                'Type a number of days',
+                'Completed tasks are only kept for this long while they are hidden',
+                valid=False, icon=icons.TASK_COMPLETED
+            )
+
+        workflow().add_item(
+            '7 days',
+            arg='-pref completed_tasks_window 7', valid=True, icon=icons.TASK_COMPLETED
+        )
+
+        workflow().add_item(
+            '30 days',
+            '(default)',
+            arg='-pref completed_tasks_window 30', valid=True, icon=icons.TASK_COMPLETED
+        )
+
+        workflow().add_item(
+            '90 days',
+            arg='-pref completed_tasks_window 90', valid=True, icon=icons.TASK_COMPLETED
+        )
+
+        workflow().add_item(
+            'Keep all completed tasks',
+            'Completed tasks are always synced, which may be slow for large lists',
+            arg='-pref completed_tasks_window 0', valid=True, icon=icons.TASK
+        )
+
         workflow().add_item(
             'Cancel',
             autocomplete='-pref', icon=icons.BACK
@@ -169,6 +267,19 @@ def filter(args):
             arg='-pref show_completed_tasks', valid=True, icon=icons.TASK_COMPLETED if prefs.show_completed_tasks else icons.TASK
         )
 
+        if not prefs.show_completed_tasks:
+            workflow().add_item(
+                'Completed tasks to keep',
+                'Keep %s while completed tasks are hidden' % _format_completed_tasks_window(prefs.completed_tasks_window),
+                autocomplete='-pref completed_tasks_window ', icon=icons.TASK_COMPLETED
+            )
+
+        workflow().add_item(
+            'Sync subtasks with lists',
+            'Otherwise subtasks are retrieved when viewing a task',
+            arg='-pref eager_subtask_sync', valid=True, icon=icons.TASK_COMPLETED if prefs.eager_subtask_sync else icons.TASK
+        )
+
         workflow().add_item(
             'Default reminder time',
             u'⏰ %s    Reminders without a specific time will be set to this time' % format_time(prefs.reminder_time, 'short'),
@@ -218,6 +329,12 @@ def filter(args):
             arg='-pref sync', valid=True, icon=icons.SYNC
         )
 
+        workflow().add_item(
+            'Network diagnostics',
+            'Request counts, latency and transfer size for each API endpoint',
+            autocomplete='-pref diagnostics', icon=icons.INFO
+        )
+
         workflow().add_item(
             'Switch theme',
             'Toggle between light and dark icons',
@@ -239,10 +356,25 @@ def commit(args, modifier=None):
         relaunch_command = ' '.join(args[args.index('--alfred') + 1:])
 
     if 'sync' in args:
-        from wunderlist.sync import sync
+        from wunderlist.sync import invalidate_revision, sync
+
+        # A forced sync should try to connect even if recent attempts failed
+        # and check every list even if nothing appears to have changed
+        if 'background' not in args:
+            from wunderlist.api import circuit
+            circuit.reset()
+            invalidate_revision()
+
         sync('background' in args)
 
         relaunch_command = None
+    elif 'diagnostics' in args:
+        from wunderlist.api import metrics
+
+        metrics.clear()
+        relaunch_command = '-pref diagnostics'
+
+        print 'Network diagnostics were reset'
     elif 'show_completed_tasks' in args:
         prefs.show_completed_tasks = not prefs.show_completed_tasks
 
@@ -250,6 +382,22 @@ def commit(args, modifier=None):
             print 'Completed tasks are now visible in the workflow'
         else:
             print 'Completed tasks will not be visible in the workflow'
+    elif 'completed_tasks_window' in args:
+        from wunderlist.models.task import Task
+
+        prefs.completed_tasks_window = int(args[2])
+
+        # Lists that were saved with a different window are synced again
+        Task.backfill_completed_tasks()
+
+        print 'The workflow will keep %s' % _format_completed_tasks_window(prefs.completed_tasks_window)
+    elif 'eager_subtask_sync' in args:
+        prefs.eager_subtask_sync = not prefs.eager_subtask_sync
+
+        if prefs.eager_subtask_sync:
+            print 'Subtasks will be synced along with their lists'
+        else:
+            print 'Subtasks will be retrieved when viewing a task'
     elif 'default_list' in args:
         default_list_id = None
         lists = workflow().stored_data('lists')
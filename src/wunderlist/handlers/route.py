@@ -2,6 +2,7 @@ import os
 import re
 
 from wunderlist import icons
+from wunderlist.api import deadline
 from wunderlist.auth import is_authorized
 from wunderlist.sync import background_sync_if_necessary
 from wunderlist.util import workflow
@@ -9,6 +10,10 @@ from wunderlist.util import workflow
 COMMAND_PATTERN = re.compile(r'^[^\w\s]+', re.UNICODE)
 ACTION_PATTERN = re.compile(r'^\W+', re.UNICODE)
 
+# Seconds that a script filter may spend waiting on the network before
+# showing results from the local database
+FILTER_LATENCY_BUDGET = 3
+
 
 def route(args):
     handler = None
@@ -79,7 +84,10 @@ def route(args):
 
             handler.commit(command, modifier)
         else:
-            handler.filter(command)
+            # Network calls made while filtering must not hold up Alfred's
+            # results indefinitely
+            with deadline.budget(getattr(handler, 'LATENCY_BUDGET', FILTER_LATENCY_BUDGET)):
+                handler.filter(command)
 
             if workflow().update_available:
                 update_data = workflow().cached_data('__workflow_update_status', max_age=0)
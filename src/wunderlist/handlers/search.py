@@ -124,6 +124,10 @@ def filter(args):
         wf.add_item('New search', autocomplete='-search ', icon=icons.CANCEL)
         wf.add_item('Main menu', autocomplete='', icon=icons.BACK)
 
+        # Older completed tasks are only saved once they can be found
+        if prefs.show_completed_tasks:
+            Task.backfill_completed_tasks()
+
         # Make sure tasks are up-to-date while searching
         background_sync()
 
@@ -2,7 +2,11 @@
 
 from datetime import date
 
+from peewee import PeeweeException
+from requests import RequestException
+
 from wunderlist import icons
+from wunderlist.api.deadline import DeadlineExceeded
 from wunderlist.models.task import Task
 from wunderlist.models.task_parser import TaskParser
 from wunderlist.util import workflow
@@ -29,6 +33,14 @@ def filter(args):
     else:
         subtitle = task.subtitle()
 
+        # Subtasks are retrieved when needed unless synced with their lists;
+        # show the saved subtasks if they cannot be retrieved in time
+        if task.list and task.id > 0:
+            try:
+                Task.sync_subtasks_in_list(task.list)
+            except (RequestException, DeadlineExceeded, PeeweeException):
+                pass
+
         if task.completed:
             wf.add_item('Mark task not completed', subtitle, modifier_subtitles={
             }, arg=' '.join(args + ['toggle-completion']), valid=True, icon=icons.TASK_COMPLETED)
@@ -37,7 +49,14 @@ def filter(args):
                 'alt': u'…and set due today    %s' % subtitle
             }, arg=' '.join(args + ['toggle-completion']), valid=True, icon=icons.TASK)
 
-        wf.add_item('View in Wunderlist', 'View and edit this task in the Wunderlist app', arg=' '.join(args + ['view']), valid=True, icon=icons.OPEN)
+        for subtask in task.subtasks:
+            wf.add_item(subtask.title, 'Subtask', icon=icons.TASK_COMPLETED if subtask.completed else icons.TASK)
+
+        # Tasks that have not been sent to Wunderlist yet have a temporary ID
+        if task.id > 0:
+            wf.add_item('View in Wunderlist', 'View and edit this task in the Wunderlist app', arg=' '.join(args + ['view']), valid=True, icon=icons.OPEN)
+        else:
+            wf.add_item('View in Wunderlist', 'Available once the task has been saved to Wunderlist', icon=icons.OPEN)
 
         if task.recurrence_type and not task.completed:
             wf.add_item('Delete', 'Delete this task and cancel recurrence', arg=' '.join(args + ['delete']), valid=True, icon=icons.TRASH)
@@ -47,7 +66,7 @@ def filter(args):
         wf.add_item('Main menu', autocomplete='', icon=icons.BACK)
 
 def commit(args, modifier=None):
-    from wunderlist.api import tasks
+    from wunderlist.models.mutation import Mutation, DELETE_TASK, UPDATE_TASK
     from wunderlist.sync import background_sync
 
     task_id = args[1]
@@ -60,18 +79,20 @@ def commit(args, modifier=None):
         if modifier == 'alt':
             due_date = date.today()
 
+        Mutation.enqueue(UPDATE_TASK, task.id,
+                         revision=task.revision,
+                         changes={'completed': not task.completed, 'due_date': due_date},
+                         previous={'completed': task.completed, 'due_date': task.due_date})
+
         if task.completed:
-            tasks.update_task(task.id, task.revision, completed=False, due_date=due_date)
             print 'The task was marked incomplete'
         else:
-            tasks.update_task(task.id, task.revision, completed=True, due_date=due_date)
             print 'The task was marked complete'
 
     elif action == 'delete':
-        if tasks.delete_task(task.id, task.revision):
-            print 'The task was deleted'
-        else:
-            print 'Please try again'
+        Mutation.enqueue(DELETE_TASK, task.id, revision=task.revision, list_id=task.list_id)
+
+        print 'The task was deleted'
 
     elif action == 'view':
         import webbrowser
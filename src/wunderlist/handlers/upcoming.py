@@ -3,14 +3,17 @@
 from datetime import date, datetime, timedelta
 
 from peewee import JOIN, OperationalError
+from requests import RequestException
 from workflow.background import is_running
 
 from wunderlist import icons
+from wunderlist.api.deadline import DeadlineExceeded
 from wunderlist.models.preferences import Preferences
 from wunderlist.models.reminder import Reminder
 from wunderlist.models.task import Task
 from wunderlist.models.list import List
-from wunderlist.sync import background_sync, background_sync_if_necessary, sync
+from wunderlist.sync import (background_sync, background_sync_if_necessary,
+                             last_sync, sync)
 from wunderlist.util import relaunch_alfred, workflow
 
 _hashtag_prompt_pattern = r'#\S*$'
@@ -86,10 +89,16 @@ def filter(args):
         return
 
     # Force a sync if not done recently or join if already running
-    if not prefs.last_sync or \
-       datetime.now() - prefs.last_sync > timedelta(seconds=30) or \
+    last = last_sync()
+
+    if not last or \
+       datetime.now() - last > timedelta(seconds=30) or \
        is_running('sync'):
-        sync()
+        try:
+            sync()
+        except (DeadlineExceeded, RequestException):
+            wf.add_item('Results may be stale', 'Wunderlist could not be reached in time, showing tasks from the last sync', icon=icons.SYNC)
+            background_sync()
 
     wf.add_item(duration_info['label'], subtitle='Change the duration for upcoming tasks', autocomplete='-upcoming duration ', icon=icons.UPCOMING)
 
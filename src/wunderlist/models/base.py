@@ -1,11 +1,11 @@
-from copy import copy
+import itertools
 import logging
 import time
 
-from dateutil import parser
 from peewee import (DateField, DateTimeField, ForeignKeyField, Model,
                     SqliteDatabase, TimeField)
 
+from wunderlist.models.fields import parse_datetime
 from wunderlist.util import workflow, NullHandler
 
 log = logging.getLogger(__name__)
@@ -13,59 +13,159 @@ log.addHandler(NullHandler())
 
 db = SqliteDatabase(workflow().datadir + '/wunderlist.db', threadlocals=True)
 
-def _balance_keys_for_insert(values):
-    all_keys = set()
-    for v in values:
-        all_keys.update(v)
+# The maximum number of parameters in an SQLite statement
+SQLITE_MAX_VARIABLES = 999
 
-    balanced_values = []
-    for v in values:
-        balanced = {}
-        for k in all_keys:
-            balanced[k] = v.get(k)
-        balanced_values.append(balanced)
+# Saved in place of the revision of an item until all of its children have
+# been synced so that an interrupted sync resumes with the item
+INCOMPLETE_REVISION = 0
 
-    return balanced_values
+class ApiMapper(object):
+    """
+    Converts items from the API to rows of a model. Compiled once per model
+    since the same keys are mapped for every item of every sync.
+    """
 
-class BaseModel(Model):
+    def __init__(self, model):
+        fields = model._meta.get_fields()
+        names = set(field.name for field in fields)
+        quote = model._meta.database.quote_char
 
-    @classmethod
-    def _api2model(cls, data):
-        fields = copy(cls._meta.fields)
-        model_data = {}
+        # Map of API key to the field name and converter
+        self.fields_by_key = {}
+        self.defaults = {}
+        self.columns = [(field.name, field.db_value) for field in fields]
+        self.insert_sql = 'INSERT OR REPLACE INTO %s%s%s (%s) VALUES (%s)' % (
+            quote, model._meta.db_table, quote,
+            ', '.join(quote + field.db_column + quote for field in fields),
+            ', '.join('?' for field in fields)
+        )
+
+        for field in fields:
+            converter = None
+
+            if isinstance(field, (DateTimeField, DateField, TimeField)):
+                converter = parse_datetime
 
-        # Map relationships, e.g. from user_id to user's
-        for (field_name, field) in cls._meta.fields.iteritems():
-            if field_name.endswith('_id'):
-                fields[field_name[:-3]] = field
-            elif isinstance(field, ForeignKeyField):
-                fields[field_name + '_id'] = field
+            self.fields_by_key[field.name] = (field.name, converter)
+
+            # Map relationships, e.g. from user_id to user
+            if field.name.endswith('_id') and field.name[:-3] not in names:
+                self.fields_by_key[field.name[:-3]] = (field.name, converter)
+            elif isinstance(field, ForeignKeyField) and field.name + '_id' not in names:
+                self.fields_by_key[field.name + '_id'] = (field.name, converter)
 
             # The Wunderlist API does not include some falsy values. For
             # example, if a task is completed then marked incomplete the
             # updated data will not include a completed key, so we have to set
             # the defaults for everything that is not specified
-            if field.default:
-                model_data[field_name] = field.default
+            if field.default is not None:
+                self.defaults[field.name] = field.default
             elif field.null:
-                model_data[field_name] = None
+                self.defaults[field.name] = None
+
+    def row(self, data):
+        """
+        The field values of an item as a dict
+        """
+        row = dict(self.defaults)
+        fields_by_key = self.fields_by_key
+
+        for (key, value) in data.iteritems():
+            if key in fields_by_key:
+                (name, converter) = fields_by_key[key]
+
+                if converter and value is not None:
+                    value = converter(value)
+
+                row[name] = value
+
+        return row
+
+    def values(self, rows):
+        """
+        Database values of each row in the order of insert_sql
+        """
+        columns = self.columns
+
+        return [tuple(db_value(row.get(name)) for (name, db_value) in columns) for row in rows]
+
+# Compiled mappers by model class
+_mappers = {}
+
+# Number of changed items, e.g. on the initial sync of a huge account, above
+# which items are normalized by a pool of processes rather than the calling
+# thread; None to always normalize each item on the calling thread as soon as
+# it is received. Off unless enabled explicitly since the process pool forks
+# while other threads are running and the database is open, which is not
+# safe on Python 2, and it has not yet been shown to be faster.
+PROCESS_POOL_THRESHOLD = None
+
+def _normalize(model, items):
+    """
+    Converts API items to rows in a worker process
+    """
+    return [model._api2model(item) for item in items]
+
+class BaseModel(Model):
+
+    @classmethod
+    def _mapper(cls):
+        mapper = _mappers.get(cls)
 
-        # Map each data property to the correct field
-        for (k, v) in data.iteritems():
-            if k in fields:
-                if isinstance(fields[k], (DateTimeField, DateField, TimeField)):
-                    model_data[fields[k].name] = parser.parse(v)
-                else:
-                    model_data[fields[k].name] = v
+        if mapper is None:
+            mapper = _mappers[cls] = ApiMapper(cls)
 
-        return model_data
+        return mapper
+
+    @classmethod
+    def _api2model(cls, data):
+        return cls._mapper().row(data)
+
+    @classmethod
+    def _normalize_items(cls, items):
+        """
+        Converts the API items to rows, spreading the work across all cores
+        if there are enough items to be worth starting processes
+        """
+        import multiprocessing
+
+        workers = multiprocessing.cpu_count()
+
+        if PROCESS_POOL_THRESHOLD is None or len(items) < PROCESS_POOL_THRESHOLD or workers < 2:
+            return [cls._api2model(item) for item in items]
+
+        from concurrent import futures
+
+        start = time.time()
+        chunk_size = len(items) // (workers * 4) + 1
+        chunks = [items[i:i + chunk_size] for i in xrange(0, len(items), chunk_size)]
+
+        try:
+            with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                rows = list(itertools.chain.from_iterable(
+                    pool.map(_normalize, [cls] * len(chunks), chunks)))
+        except OSError:
+            log.exception('Unable to start processes, normalizing %d items on this thread', len(items))
+            return [cls._api2model(item) for item in items]
+
+        log.info('Normalized %d items in %d processes in %s', len(items), workers, time.time() - start)
+
+        return rows
 
     @classmethod
     def sync(cls):
         pass
 
     @classmethod
-    def _perform_updates(cls, model_instances, update_items):
+    def _perform_updates(cls, model_instances, update_items, index=None):
+        """
+        Saves the items that changed since the model instances and deletes
+        instances that are no longer in the data. An index of the saved
+        revisions, e.g. the tasks read at the start of the sync, answers
+        lookups of items that are not among the instances and is updated
+        with the changes.
+        """
         start = time.time()
         instances_by_id = dict((instance.id, instance) for instance in model_instances if instance)
 
@@ -87,57 +187,94 @@ class BaseModel(Model):
                 return False
             return True
 
-        changed_items = [item for item in update_items if revised(item)]
+        # Map of id to the normalized item. update_items may be a stream, so
+        # each item is normalized as soon as it is received unless they are
+        # normalized together by a pool of processes.
+        changed_items = {}
+        revised_items = []
+        update_count = 0
+
+        for item in update_items:
+            update_count += 1
+            if not revised(item):
+                continue
+
+            if PROCESS_POOL_THRESHOLD is None:
+                changed_items[item['id']] = cls._api2model(item)
+            else:
+                revised_items.append(item)
+
+        for changed_item in cls._normalize_items(revised_items):
+            changed_items[changed_item['id']] = changed_item
+
+        # Items that were not among the known instances may still exist
+        # locally, e.g. a task moved from another list
+        unknown_ids = [id for id in changed_items if id not in instances_by_id]
+
+        if index is not None:
+            unknown_instances = [cls(id=id, revision=index.revision(id)) for id in unknown_ids
+                                 if index.revision(id) is not None]
+        else:
+            unknown_instances = []
+
+            for i in xrange(0, len(unknown_ids), 500):
+                unknown_instances.extend(cls.select(cls.id, cls.revision)
+                                         .where(cls.id.in_(unknown_ids[i:i + 500])))
+
+        for instance in unknown_instances:
+            if instance.revision == changed_items[instance.id]['revision']:
+                del changed_items[instance.id]
+            else:
+                instances_by_id[instance.id] = instance
 
-        # Map of id to the normalized item
-        changed_items = dict((item['id'], cls._api2model(item)) for item in changed_items)
         all_instances = []
-        log.info('Prepared %d of %d updated items in %s', len(changed_items), len(update_items), time.time() - start)
-
-        # Update all the changed metadata and remove instances that no longer
-        # exist
-        with db.atomic():
-            for id, instance in instances_by_id.iteritems():
-                if not instance:
-                    continue
-                if id in changed_items:
-                    changed_item = changed_items[id]
-                    all_instances.append(instance)
-
-                    if cls._meta.has_children:
-                        log.info('Syncing children of %s', instance)
-                        instance._sync_children()
-                    cls.update(**changed_item).where(cls.id == id).execute()
-                    log.info('Updated %s to revision %d', instance, changed_item['revision'])
-                    log.debug('with data %s', changed_item)
+        parents = []
+        checkpoint_revisions = {}
+
+        if cls._meta.has_children:
+            for (id, changed_item) in changed_items.iteritems():
+                checkpoint_revisions[id] = changed_item['revision']
+                changed_item['revision'] = INCOMPLETE_REVISION
+        log.info('Prepared %d of %d updated items in %s', len(changed_items), update_count, time.time() - start)
+        start = time.time()
 
-                    del changed_items[id]
-                # The model does not exist anymore
-                else:
-                    instance.delete_instance()
-                    log.info('Deleted %s', instance)
+        # Instances that are not in the data no longer exist
+        deleted_ids = [id for (id, instance) in instances_by_id.iteritems()
+                       if instance and id not in changed_items]
+        changed_values = changed_items.values()
+        database = cls._meta.database
 
-        # Bulk insert and retrieve
-        new_values = changed_items.values()
+        with database.atomic():
+            for i in xrange(0, len(deleted_ids), SQLITE_MAX_VARIABLES):
+                cls.delete().where(cls.id.in_(deleted_ids[i:i + SQLITE_MAX_VARIABLES])).execute()
 
-        # Insert in batches
-        for i in xrange(0, len(new_values), 500):
-            inserted_chunk = _balance_keys_for_insert(new_values[i:i + 500])
+            # New and changed items are written together, replacing the
+            # changed rows in their entirety
+            if changed_values:
+                mapper = cls._mapper()
+                database.get_cursor().executemany(mapper.insert_sql, mapper.values(changed_values))
 
-            with db.atomic():
-                cls.insert_many(inserted_chunk).execute()
+        if index is not None:
+            index.deleted(deleted_ids)
+            index.saved(changed_values)
 
-                log.info('Created %d of model %s', len(inserted_chunk), cls.__name__)
+        log.info('Saved %d and deleted %d of model %s in %s', len(changed_values),
+                 len(deleted_ids), cls.__name__, time.time() - start)
 
-                inserted_ids = [i['id'] for i in inserted_chunk]
-                inserted_instances = cls.select().where(cls.id.in_(inserted_ids))
+        # The saved data is already in hand, so it does not need to be read
+        # back from the database
+        for changed_item in changed_values:
+            instance = cls(**changed_item)
+            all_instances.append(instance)
 
-                for instance in inserted_instances:
-                    if type(instance)._meta.has_children:
-                        log.info('Syncing children of %s', instance)
-                        instance._sync_children()
+            if cls._meta.has_children:
+                instance._checkpoint_revision = checkpoint_revisions[instance.id]
+                parents.append(instance)
 
-                all_instances += inserted_instances
+        # Children are synced once all of the parents have been saved so that
+        # they can be retrieved together
+        if parents:
+            cls._sync_children_of(parents)
 
         return all_instances
 
@@ -145,6 +282,28 @@ class BaseModel(Model):
     def _populate_api_extras(cls, info):
         return info
 
+    @classmethod
+    def _sync_children_of(cls, instances):
+        for instance in instances:
+            log.info('Syncing children of %s', instance)
+            instance._sync_children()
+            instance.checkpoint()
+
+    def checkpoint(self):
+        """
+        Saves the revision of an item once all of its children have been
+        synced; until then the item keeps INCOMPLETE_REVISION so that the
+        next sync resumes with it
+        """
+        revision = getattr(self, '_checkpoint_revision', None)
+
+        if revision is not None:
+            type(self).update(revision=revision).where(type(self).id == self.id).execute()
+            self.revision = revision
+            self._checkpoint_revision = None
+
+            log.info('Synced %s at revision %d', self, revision)
+
     def __str__(self):
         return '<%s %s>' % (type(self).__name__, self.id)
 
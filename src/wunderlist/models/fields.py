@@ -4,6 +4,39 @@ from dateutil.tz import tzutc
 from peewee import DateTimeField
 from wunderlist.util import utc_to_local
 
+_utc = tzutc()
+
+def parse_datetime(value):
+    """
+    Parses a timestamp such as 2016-01-02T12:00:00.000Z or a date such as
+    2016-01-02 as emitted by the Wunderlist API, returning the same value as
+    dateutil would. Anything in another format is left to dateutil, which is
+    much slower.
+    """
+    length = len(value)
+
+    try:
+        if (length in (20, 24) and value[10] == 'T' and value[-1] == 'Z' and
+                value[4] == value[7] == '-' and value[13] == value[16] == ':'):
+            microsecond = 0
+
+            if length == 24:
+                if value[19] != '.':
+                    raise ValueError(value)
+                microsecond = int(value[20:23]) * 1000
+
+            return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                            microsecond, _utc)
+        elif length == 10 and value[4] == value[7] == '-':
+            return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    except ValueError:
+        pass
+
+    from dateutil import parser
+
+    return parser.parse(value)
+
 class DateTimeUTCField(DateTimeField):
     def python_value(self, value):
         value = super(DateTimeUTCField, self).python_value(value)
@@ -24,25 +24,35 @@ class List(BaseModel):
     created_at = DateTimeUTCField()
 
     @classmethod
-    def sync(cls):
+    def sync(cls, lists_data=None):
         from wunderlist.api import lists
         start = time.time()
-
-        lists_data = lists.lists()
         instances = []
 
-        log.info('Retrieved all %d lists in %s', len(lists_data), time.time() - start)
-        start = time.time()
+        if lists_data is None:
+            lists_data = lists.lists()
+
+            log.info('Retrieved all %d lists in %s', len(lists_data), time.time() - start)
+            start = time.time()
 
         workflow().store_data('lists', lists_data)
 
         try:
-            instances = cls.select(cls.id, cls.revision, cls.title)
+            instances = list(cls.select(cls.id, cls.revision, cls.title, cls.order))
         except PeeweeException:
             pass
 
         log.info('Loaded all %d lists from the database in %s', len(instances), time.time() - start)
 
+        # Rearranging lists does not change their revisions
+        order_by_list_id = dict((l['id'], l['order']) for l in lists_data)
+
+        for instance in instances:
+            order = order_by_list_id.get(instance.id)
+
+            if order is not None and order != instance.order:
+                cls.update(order=order).where(cls.id == instance.id).execute()
+
         return cls._perform_updates(instances, lists_data)
 
     @classmethod
@@ -53,6 +63,12 @@ class List(BaseModel):
 
         return info
 
+    @classmethod
+    def _sync_children_of(cls, instances):
+        from wunderlist.models.task import Task
+
+        Task.sync_tasks_in_lists(instances)
+
     def __str__(self):
         return u'<%s %d %s>' % (type(self).__name__, self.id, self.title)
 
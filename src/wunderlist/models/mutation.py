@@ -0,0 +1,410 @@
+import cPickle as pickle
+from datetime import datetime
+import logging
+
+from peewee import (BlobField, CharField, DateTimeField, IntegerField,
+                    PrimaryKeyField, TextField)
+from requests import RequestException
+
+from wunderlist.models.base import BaseModel
+from wunderlist.util import NullHandler
+
+log = logging.getLogger(__name__)
+log.addHandler(NullHandler())
+
+CREATE_TASK = 'create_task'
+UPDATE_TASK = 'update_task'
+DELETE_TASK = 'delete_task'
+CREATE_LIST = 'create_list'
+
+# Sent separately from the new task that they belong to so that a failure
+# after the task was created does not cause it to be created again
+CREATE_REMINDER = 'create_reminder'
+CREATE_NOTE = 'create_note'
+
+# Sending these again after a response was lost creates a duplicate
+_NOT_IDEMPOTENT = (CREATE_TASK, CREATE_LIST, CREATE_REMINDER, CREATE_NOTE)
+
+# Attempts to send a mutation before it is abandoned and reported
+MAX_ATTEMPTS = 5
+
+
+class MutationFailed(Exception):
+    """
+    The API rejected the mutation, so sending it again would not help
+    """
+    pass
+
+
+def _temporary_task_id():
+    """
+    A negative ID that cannot be confused with a task from Wunderlist
+    """
+    from peewee import fn
+    from wunderlist.models.task import Task
+
+    Task.create_table(fail_silently=True)
+    lowest = Task.select(fn.Min(Task.id)).scalar() or 0
+
+    return min(lowest, 0) - 1
+
+
+def _completed_at(completed):
+    return datetime.utcnow() if completed else None
+
+
+def _delete_local_task(task_id):
+    from wunderlist.models.task import Task
+
+    Task.delete().where((Task.id == task_id) | (Task.task == task_id)).execute()
+
+
+class Mutation(BaseModel):
+    """
+    A change made in the workflow that has not yet been sent to Wunderlist.
+    Mutations are sent in the order in which they were made by flush(),
+    which is called during sync.
+
+    Each mutation is applied to the local database as soon as it is queued
+    so that the change is visible right away. A new task is given a
+    temporary negative ID that is replaced by its real ID once it has been
+    created in Wunderlist.
+    """
+    id = PrimaryKeyField()
+    action = CharField()
+    target_id = IntegerField(index=True, null=True)
+    payload = BlobField()
+    attempts = IntegerField(default=0)
+    last_error = TextField(null=True)
+    created_at = DateTimeField(default=datetime.now)
+
+    @classmethod
+    def enqueue(cls, action, target_id=None, **params):
+        """
+        Stores the mutation, combining it with any pending mutations of the
+        same item, and returns without waiting for the network
+        """
+        from wunderlist.sync import invalidate_revision
+
+        cls.create_table(fail_silently=True)
+
+        # Make sure that the next sync sends the change
+        invalidate_revision()
+
+        with cls._meta.database.atomic():
+            pending = []
+            follow_ups = []
+
+            # A reminder or note is added by its own request once the new
+            # task exists
+            if action == CREATE_TASK:
+                reminder_date = params.pop('reminder_date', None)
+                note = params.pop('note', None)
+
+                if reminder_date:
+                    follow_ups.append((CREATE_REMINDER, {'date': reminder_date}))
+                if note:
+                    follow_ups.append((CREATE_NOTE, {'content': note}))
+
+            if target_id is not None:
+                pending = list(cls.select()
+                               .where(cls.target_id == target_id)
+                               .order_by(cls.id.asc()))
+            elif action == CREATE_TASK:
+                target_id = _temporary_task_id()
+
+            # The change is made locally even if nothing remains to be sent,
+            # e.g. a task that was completed then marked incomplete again
+            cls(action=action, target_id=target_id,
+                payload=pickle.dumps(params, pickle.HIGHEST_PROTOCOL))._apply()
+
+            params = cls._coalesce(action, target_id, params, pending)
+
+            if params is None:
+                return None
+
+            mutation = cls.create(action=action, target_id=target_id,
+                                  payload=pickle.dumps(params, pickle.HIGHEST_PROTOCOL))
+
+            for (follow_up_action, follow_up_params) in follow_ups:
+                cls.create(action=follow_up_action, target_id=target_id,
+                           payload=pickle.dumps(follow_up_params, pickle.HIGHEST_PROTOCOL))
+
+            return mutation
+
+    @classmethod
+    def _coalesce(cls, action, target_id, params, pending):
+        """
+        Removes pending mutations made redundant by the new one and returns
+        the parameters for the new mutation, or None if nothing remains to
+        be sent
+        """
+        created = None
+
+        for mutation in pending:
+            if mutation.action == CREATE_TASK:
+                created = mutation
+
+        if action == DELETE_TASK:
+            if created:
+                # The task was never sent, so there is nothing to delete
+                for mutation in pending:
+                    mutation.delete_instance()
+                _delete_local_task(target_id)
+
+                return None
+
+            # Nothing done to the task before it is deleted matters
+            for mutation in pending:
+                if mutation.action in (UPDATE_TASK, CREATE_REMINDER, CREATE_NOTE):
+                    mutation.delete_instance()
+
+        elif action == UPDATE_TASK and created:
+            # Create the task with the changes rather than updating it later
+            create_params = created.params
+            create_params.update(params['changes'])
+            created.payload = pickle.dumps(create_params, pickle.HIGHEST_PROTOCOL)
+            created.save()
+            created._apply()
+
+            return None
+
+        elif action == UPDATE_TASK:
+            for mutation in pending:
+                if mutation.action != UPDATE_TASK:
+                    continue
+
+                earlier = mutation.params
+                changes = dict(earlier['changes'], **params['changes'])
+                previous = dict(params.get('previous', {}), **earlier.get('previous', {}))
+
+                params = {
+                    'revision': earlier['revision'],
+                    'changes': changes,
+                    'previous': previous
+                }
+                mutation.delete_instance()
+
+            # e.g. a task that was completed then marked incomplete again
+            previous = params.get('previous', {})
+            changes = dict((key, value) for (key, value) in params['changes'].iteritems()
+                           if key not in previous or previous[key] != value)
+
+            if not changes:
+                log.info('Pending changes to task %s cancelled each other out', target_id)
+                return None
+
+            params['changes'] = changes
+
+        return params
+
+    @classmethod
+    def pending(cls):
+        return cls.select().order_by(cls.id.asc())
+
+    @classmethod
+    def flush(cls):
+        """
+        Sends pending mutations in order, stopping at the first one that
+        fails due to a network error so that it can be retried in order
+        during the next sync. Within a deadline, e.g. while Alfred waits for
+        results, flushing stops before anything would be created since a
+        request cut short may still have succeeded. Returns the number of
+        mutations sent.
+        """
+        from workflow.notify import notify
+        from wunderlist.api import deadline
+
+        cls.create_table(fail_silently=True)
+        sent = 0
+
+        while True:
+            # Read each mutation just before sending it since revisions are
+            # updated as earlier mutations are sent
+            mutation = cls.pending().first()
+
+            if not mutation:
+                break
+
+            if mutation.action in _NOT_IDEMPOTENT and deadline.remaining() is not None:
+                log.info('Leaving %s for a sync without a deadline', mutation)
+                break
+
+            try:
+                result = mutation._send()
+            except MutationFailed as e:
+                log.error('Wunderlist rejected %s: %s', mutation, e)
+                notify('Unable to save a change', mutation.description)
+                mutation._discard()
+                continue
+            except RequestException as e:
+                mutation.attempts += 1
+                mutation.last_error = unicode(e)
+
+                if mutation.attempts >= MAX_ATTEMPTS:
+                    log.error('Giving up on %s after %d attempts: %s', mutation, mutation.attempts, e)
+                    notify('Unable to save a change', mutation.description)
+                    mutation._discard()
+                    continue
+
+                log.info('Unable to send %s, will retry: %s', mutation, e)
+                mutation.save()
+                break
+
+            # The new ID must be recorded along with the mutation being sent
+            with cls._meta.database.atomic():
+                mutation.delete_instance()
+                mutation._reconcile(result)
+            sent += 1
+
+        return sent
+
+    @property
+    def params(self):
+        return pickle.loads(str(self.payload))
+
+    @property
+    def description(self):
+        params = self.params
+
+        if self.action == CREATE_TASK:
+            return u'Adding the task %s' % params['title']
+        elif self.action == UPDATE_TASK:
+            return u'Updating task %d' % self.target_id
+        elif self.action == DELETE_TASK:
+            return u'Deleting task %d' % self.target_id
+        elif self.action == CREATE_LIST:
+            return u'Creating the list %s' % params['title']
+        elif self.action == CREATE_REMINDER:
+            return u'Adding a reminder to task %d' % self.target_id
+        elif self.action == CREATE_NOTE:
+            return u'Adding a note to task %d' % self.target_id
+
+        return self.action
+
+    def _send(self):
+        from wunderlist.api import lists, notes, reminders, tasks
+
+        params = self.params
+        result = None
+
+        if self.action == CREATE_TASK:
+            result = tasks.create_task(**params)
+        elif self.action == UPDATE_TASK:
+            result = tasks.update_task(self.target_id, params['revision'], **params['changes'])
+        elif self.action == DELETE_TASK:
+            if not tasks.delete_task(self.target_id, params['revision']):
+                raise MutationFailed('The task could not be deleted')
+        elif self.action == CREATE_LIST:
+            result = lists.create_list(**params)
+        elif self.action == CREATE_REMINDER:
+            result = reminders.create_reminder(self.target_id, params['date'])
+        elif self.action == CREATE_NOTE:
+            result = notes.create_note(self.target_id, params['content'])
+
+        if isinstance(result, dict) and 'error' in result:
+            raise MutationFailed(result['error'])
+
+        log.info('Sent %s', self)
+
+        return result
+
+    def _apply(self):
+        """
+        Makes the change to the local database ahead of sending it
+        """
+        from wunderlist.models.task import Task
+
+        params = self.params
+
+        if self.action == CREATE_TASK:
+            values = dict(
+                list=params['list_id'],
+                title=params['title'],
+                assignee=params.get('assignee_id'),
+                recurrence_type=params.get('recurrence_type'),
+                recurrence_count=params.get('recurrence_count'),
+                due_date=params.get('due_date'),
+                starred=params.get('starred'),
+                completed_at=_completed_at(params.get('completed'))
+            )
+
+            if Task.update(**values).where(Task.id == self.target_id).execute() == 0:
+                Task.insert(id=self.target_id, revision=0, created_at=datetime.utcnow(),
+                            **values).execute()
+        elif self.action == UPDATE_TASK:
+            changes = dict(params['changes'])
+
+            if 'completed' in changes:
+                changes['completed_at'] = _completed_at(changes.pop('completed'))
+
+            Task.update(**changes).where(Task.id == self.target_id).execute()
+        elif self.action == DELETE_TASK:
+            _delete_local_task(self.target_id)
+
+        log.debug('Applied %s locally', self)
+
+    def _reconcile(self, result):
+        """
+        Replaces the local copy of the item with the one returned by the API
+        and updates later mutations of the same item to refer to its new
+        revision and ID
+        """
+        from wunderlist.models.task import Task
+
+        if self.action not in (CREATE_TASK, UPDATE_TASK):
+            return
+        if self.target_id is None or not isinstance(result, dict) or 'revision' not in result:
+            return
+
+        values = Task._api2model(result)
+
+        # Positions are not part of the task data
+        del values['order']
+
+        Task.update(**values).where(Task.id == self.target_id).execute()
+
+        if self.target_id != result['id']:
+            log.info('Task %d was created as %d', self.target_id, result['id'])
+
+        for mutation in type(self).select().where(type(self).target_id == self.target_id):
+            params = mutation.params
+
+            if 'revision' in params:
+                params['revision'] = result['revision']
+                mutation.payload = pickle.dumps(params, pickle.HIGHEST_PROTOCOL)
+
+            mutation.target_id = result['id']
+            mutation.save()
+
+    def _discard(self):
+        """
+        Removes a mutation that could not be sent and reverts the local
+        change so that the next sync restores the task from Wunderlist
+        """
+        from wunderlist.models.list import List
+        from wunderlist.models.root import Root
+        from wunderlist.models.task import Task
+        from wunderlist.models.task_collection import TaskCollection
+
+        self.delete_instance()
+
+        if self.action == CREATE_TASK:
+            _delete_local_task(self.target_id)
+        elif self.action in (UPDATE_TASK, DELETE_TASK):
+            # Revisions that no longer match Wunderlist cause the task, its
+            # list and the root to be synced again even though nothing
+            # changed remotely, and the list's tasks must all be saved again
+            list_id = self.params.get('list_id')
+            task = Task.select(Task.id, Task.list).where(Task.id == self.target_id).first()
+
+            if task:
+                list_id = task.list_id
+                Task.update(revision=0).where(Task.id == task.id).execute()
+
+            List.update(revision=0).where(List.id == list_id).execute()
+            Root.update(revision=0).execute()
+            TaskCollection.invalidate(list_id)
+
+    def __str__(self):
+        return '<%s %s %s %s>' % (type(self).__name__, self.id or '', self.action, self.target_id or '')
@@ -5,8 +5,10 @@ from wunderlist.util import workflow
 DEFAULT_LIST_MOST_RECENT = -1
 
 AUTOMATIC_REMINDERS_KEY = 'automatic_reminders'
+COMPLETED_TASKS_WINDOW_KEY = 'completed_tasks_window'
 DEFAULT_LIST_ID_KEY = 'default_list_id'
 DUE_ORDER_KEY = 'due_order'
+EAGER_SUBTASK_SYNC_KEY = 'eager_subtask_sync'
 EXPLICIT_KEYWORDS_KEY = 'explicit_keywords'
 HOIST_SKIPPED_TASKS_KEY = 'hoist_skipped_tasks'
 ICON_THEME_KEY = 'icon_theme'
@@ -174,6 +176,26 @@ class Preferences(object):
     def show_completed_tasks(self, show_completed_tasks):
         self._set(SHOW_COMPLETED_TASKS_KEY, show_completed_tasks)
 
+    @property
+    def completed_tasks_window(self):
+        """
+        Days of completed tasks to keep while completed tasks are hidden, or
+        0 to keep all of them
+        """
+        return self._get(COMPLETED_TASKS_WINDOW_KEY, 30)
+
+    @completed_tasks_window.setter
+    def completed_tasks_window(self, completed_tasks_window):
+        self._set(COMPLETED_TASKS_WINDOW_KEY, completed_tasks_window)
+
+    @property
+    def eager_subtask_sync(self):
+        return self._get(EAGER_SUBTASK_SYNC_KEY, False)
+
+    @eager_subtask_sync.setter
+    def eager_subtask_sync(self, eager_subtask_sync):
+        self._set(EAGER_SUBTASK_SYNC_KEY, eager_subtask_sync)
+
     @property
     def upcoming_duration(self):
         return self._get(UPCOMING_DURATION_KEY, 7)
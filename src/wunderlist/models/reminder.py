@@ -21,21 +21,26 @@ class Reminder(BaseModel):
     created_at = DateTimeUTCField()
 
     @classmethod
-    def sync(cls):
+    def sync(cls, reminders_data=None):
         from wunderlist.api import reminders
         start = time.time()
         instances = []
 
-        reminders_data = reminders.reminders()
+        if reminders_data is None:
+            reminders_data = reminders.reminders(streamed=True)
 
-        log.info('Retrieved all %d reminders in %s', len(reminders_data), time.time() - start)
-        start = time.time()
+            log.info('Started retrieving reminders in %s', time.time() - start)
+            start = time.time()
 
         try:
             instances = cls.select(cls.id, cls.revision)
         except PeeweeException:
             pass
 
+        # Only reminders of saved tasks can be saved
+        task_ids = set(task.id for task in Task.select(Task.id))
+        reminders_data = (reminder for reminder in reminders_data if reminder['task_id'] in task_ids)
+
         log.info('Loaded all %d reminders from the database in %s', len(instances), time.time() - start)
 
         return cls._perform_updates(instances, reminders_data)
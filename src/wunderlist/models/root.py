@@ -19,14 +19,15 @@ class Root(BaseModel):
     revision = IntegerField()
 
     @classmethod
-    def sync(cls, background=False):
+    def sync(cls, background=False, root_data=None):
         from wunderlist.api import root
 
         start = time.time()
         instance = None
-        root_data = root.root()
 
-        log.info('Retrieved Root revision in %s', time.time() - start)
+        if root_data is None:
+            root_data = root.root()
+            log.info('Retrieved Root revision in %s', time.time() - start)
 
         try:
             instance = cls.get()
@@ -40,33 +41,50 @@ class Root(BaseModel):
         return cls._perform_updates([instance], [root_data])
 
     def _sync_children(self):
+        from wunderlist.api import lists, user
         from wunderlist.models.hashtag import Hashtag
         from wunderlist.models.preferences import Preferences
         from wunderlist.models.reminder import Reminder
+        from wunderlist.models.sync_graph import Stage, SyncGraph
 
         start = time.time()
-        user_revised = User.sync()
-        log.info('Synced user in %s', time.time() - start)
-        start = time.time()
-
-        lists_revised = List.sync()
-        log.info('Synced lists and tasks in %s', time.time() - start)
-        start = time.time()
+        stored_user = User.select(User.revision).first()
 
         # Changes to reminders or settings increment the User revision
-        if user_revised:
-            Preferences.sync()
-            log.info('Synced preferences in %s', time.time() - start)
-            start = time.time()
-
-            Reminder.sync()
-            log.info('Synced reminders in %s', time.time() - start)
-            start = time.time()
-
-        # Changes in lists or tasks require hashtags to be updated
-        if lists_revised:
-            Hashtag.sync()
-            log.info('Synced hashtags in %s', time.time() - start)
+        def user_unchanged(results):
+            return stored_user and stored_user.revision == results['user_data']['revision']
+
+        # The reminders in changed lists are saved along with their tasks, so
+        # the reminders of the whole account are only requested when no list
+        # changed
+        def sync_reminders(results):
+            if results['lists']:
+                return None
+
+            return Reminder.sync()
+
+        SyncGraph([
+            Stage('user_data', lambda results: user.user()),
+            Stage('lists_data', lambda results: lists.lists()),
+            Stage('lists', lambda results: List.sync(results['lists_data']),
+                  requires=['lists_data'], writer=True),
+            Stage('preferences', lambda results: Preferences.sync(),
+                  requires=['user_data'], writer=True, skip=user_unchanged),
+            # A change to a reminder alone only increments the User revision.
+            # Saved after the tasks since reminders refer to them, streaming
+            # the response straight into the database.
+            Stage('reminders', sync_reminders,
+                  requires=['user_data', 'lists'], writer=True, skip=user_unchanged),
+            # Saved last so that an interrupted sync retries the stages that
+            # depend on the User revision
+            Stage('user', lambda results: User.sync(results['user_data']),
+                  requires=['user_data', 'preferences', 'reminders'], writer=True),
+            # Changes in lists or tasks require hashtags to be updated
+            Stage('hashtags', lambda results: Hashtag.sync(),
+                  requires=['lists'], writer=True, skip=lambda results: not results['lists'])
+        ]).run()
+
+        log.info('Synced user, lists, tasks and reminders in %s', time.time() - start)
 
     def __str__(self):
         return '<%s>' % (type(self).__name__)
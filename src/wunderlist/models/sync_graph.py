@@ -0,0 +1,145 @@
+import logging
+from Queue import Queue
+import sys
+import threading
+import time
+
+from wunderlist.api import deadline
+from wunderlist.util import NullHandler
+
+log = logging.getLogger(__name__)
+log.addHandler(NullHandler())
+
+# Stages that wait on the network at the same time
+MAX_WORKERS = 4
+
+# Result of a stage that did not need to run
+SKIPPED = object()
+
+
+class Stage(object):
+    """
+    A step of the sync. The function receives a dict of the results of all
+    stages completed so far and its return value becomes the stage's result.
+
+    A stage starts once all of the stages it requires have completed and is
+    skipped if any of them were skipped or if skip(results) is true. Writer
+    stages are run one at a time by the thread that runs the graph since
+    SQLite only allows a single writer and workflow data can only be stored
+    from the main thread; all others run on a thread pool and must only
+    read.
+    """
+
+    def __init__(self, name, function, requires=(), writer=False, skip=None):
+        self.name = name
+        self.function = function
+        self.requires = tuple(requires)
+        self.writer = writer
+        self.skip = skip
+
+    def __str__(self):
+        return '<%s %s>' % (type(self).__name__, self.name)
+
+
+class SyncGraph(object):
+    """
+    Runs each stage as soon as the stages it depends on have completed
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.results = {}
+
+        names = set(stage.name for stage in self.stages)
+
+        for stage in self.stages:
+            missing = set(stage.requires) - names
+            if missing:
+                raise ValueError('%s requires unknown stages %s' % (stage, ', '.join(missing)))
+
+    def run(self):
+        from concurrent import futures
+
+        self._lock = threading.Lock()
+        self._started = set()
+        self._failed = False
+        # Writer stages that are ready to run, the exc_info of a pool stage
+        # that failed, or None once all stages have completed
+        self._queue = Queue()
+
+        with futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as self._executor:
+            try:
+                self._schedule()
+
+                while True:
+                    item = self._queue.get()
+
+                    if item is None:
+                        break
+                    elif isinstance(item, Stage):
+                        self._complete(item, self._run(item))
+                    else:
+                        raise item[0], item[1], item[2]
+            except:
+                # Let stages that are already running finish without starting
+                # any more
+                self._failed = True
+                raise
+
+        return self.results
+
+    def _run(self, stage):
+        start = time.time()
+        result = stage.function(self.results)
+
+        log.info('Completed %s stage in %s', stage.name, time.time() - start)
+
+        return result
+
+    def _run_in_pool(self, stage):
+        try:
+            result = self._run(stage)
+        except Exception:
+            self._queue.put(sys.exc_info())
+        else:
+            self._complete(stage, result)
+
+    def _complete(self, stage, result):
+        with self._lock:
+            self.results[stage.name] = result
+
+        self._schedule()
+
+    def _schedule(self):
+        """
+        Starts or skips every stage whose requirements have been met
+        """
+        with self._lock:
+            if self._failed:
+                return
+
+            progress = True
+
+            while progress:
+                progress = False
+
+                for stage in self.stages:
+                    if stage.name in self._started:
+                        continue
+                    if not all(name in self.results for name in stage.requires):
+                        continue
+
+                    self._started.add(stage.name)
+                    progress = True
+
+                    if (any(self.results[name] is SKIPPED for name in stage.requires) or
+                            (stage.skip and stage.skip(self.results))):
+                        log.info('Skipped %s stage', stage.name)
+                        self.results[stage.name] = SKIPPED
+                    elif stage.writer:
+                        self._queue.put(stage)
+                    else:
+                        self._executor.submit(deadline.inherit(self._run_in_pool), stage)
+
+            if len(self.results) == len(self.stages):
+                self._queue.put(None)
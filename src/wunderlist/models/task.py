@@ -1,16 +1,21 @@
 # encoding: utf-8
 
-from datetime import date
+from datetime import date, datetime, timedelta
+import itertools
 import logging
 import time
 
 from peewee import (BooleanField, CharField, DateField, ForeignKeyField,
-                    IntegerField, PeeweeException, PrimaryKeyField, TextField,
-                    JOIN)
+                    IntegerField, PeeweeException, PrimaryKeyField, TextField)
 
 from wunderlist.models.fields import DateTimeUTCField
 from wunderlist.models.base import BaseModel
 from wunderlist.models.list import List
+from wunderlist.models.task_collection import (COMPLETED_TASKS,
+                                               CURRENT_SUBTASKS, POSITIONS,
+                                               RECENTLY_COMPLETED_TASKS,
+                                               REMINDERS, SUBTASK_POSITIONS,
+                                               SUBTASKS, TASKS, TaskCollection)
 from wunderlist.models.user import User
 from wunderlist.util import short_relative_formatted_date, NullHandler
 
@@ -24,6 +29,37 @@ _days_by_recurrence_type = {
     'year': 365
 }
 
+# Each list's tasks are retrieved as separate collections, each of which is
+# only saved again once it changes. The reminders of the tasks are saved
+# along with them.
+_collections = (
+    (TASKS, {'completed': False}),
+    (COMPLETED_TASKS, {'completed': True}),
+    (SUBTASKS, {'subtasks': True}),
+    (REMINDERS, {})
+)
+
+def _synced_collections():
+    """
+    Subtasks are only synced along with the rest of the list if preferred,
+    otherwise they are retrieved once a task in the list is viewed
+    """
+    from wunderlist.models.preferences import Preferences
+
+    if Preferences.current_prefs().eager_subtask_sync:
+        return _collections
+
+    return tuple((kind, params) for (kind, params) in _collections if kind != SUBTASKS)
+
+def _collection_kind(kind, completed_since):
+    """
+    Completed tasks are saved as a separate collection while they are limited
+    to a window so that the full collection can be requested once needed
+    """
+    if kind == COMPLETED_TASKS and completed_since:
+        return RECENTLY_COMPLETED_TASKS
+    return kind
+
 _star = u'★'
 _overdue_1x = u'⚠️'
 _overdue_2x = u'❗️'
@@ -49,59 +85,319 @@ class Task(BaseModel):
 
     @classmethod
     def sync_tasks_in_list(cls, list):
-        from wunderlist.api import tasks
+        cls.sync_tasks_in_lists([list])
+
+    @classmethod
+    def sync_tasks_in_lists(cls, lists):
+        """
+        Downloads the tasks in several lists concurrently. Each list is saved
+        by the calling thread as soon as all of its tasks have been received
+        so that SQLite only ever has a single writer. The saved tasks are
+        read once for all of the lists.
+        """
         from concurrent import futures
         start = time.time()
+        requests_by_list_id = {}
+        list_by_job = {}
+        remaining_by_list_id = {}
+        saved_validators = TaskCollection.validators(list.id for list in lists)
+        completed_since = cls._completed_since()
+        index = RevisionIndex.load()
+
+        log.info('Loaded the revisions of %d saved tasks in %s', len(index.tasks), time.time() - start)
+
+        # All requests are queued at once and the shared executor limits how
+        # many are made at the same time
+        for list in lists:
+            (positions_jobs, tasks_jobs) = cls._request_tasks_in_list(list, saved_validators, completed_since)
+
+            requests_by_list_id[list.id] = (positions_jobs, tasks_jobs)
+            remaining_by_list_id[list.id] = len(positions_jobs) + len(tasks_jobs)
+
+            for job in positions_jobs + tasks_jobs:
+                list_by_job[job] = list
+
+        try:
+            for job in futures.as_completed(list_by_job):
+                list = list_by_job[job]
+                remaining_by_list_id[list.id] -= 1
+
+                if remaining_by_list_id[list.id] == 0:
+                    (positions_jobs, tasks_jobs) = requests_by_list_id.pop(list.id)
+                    (positions, collections) = cls._tasks_in_list(list, positions_jobs, tasks_jobs, completed_since)
+
+                    # The list is only up-to-date once its tasks are saved
+                    with cls._meta.database.atomic():
+                        cls._update_tasks_in_list(list, positions, collections,
+                                                  saved_validators.get((list.id, POSITIONS)),
+                                                  index=index)
+                        list.checkpoint()
+        except:
+            # Requests for the remaining lists are of no use once the sync
+            # has failed, e.g. when the deadline passed
+            for job in list_by_job:
+                job.cancel()
+            raise
+
+        cls._delete_orphaned_reminders()
+
+        log.info('Synced tasks in %d lists in %s', len(lists), time.time() - start)
+
+    @classmethod
+    def _completed_since(cls):
+        """
+        The earliest completion time of completed tasks to save, as it appears
+        in the API, or None to save all completed tasks
+        """
+        from wunderlist.models.preferences import Preferences
+
+        prefs = Preferences.current_prefs()
+
+        if prefs.show_completed_tasks or not prefs.completed_tasks_window:
+            return None
+
+        since = datetime.utcnow() - timedelta(days=prefs.completed_tasks_window)
+
+        return since.strftime('%Y-%m-%dT%H:%M:%S')
+
+    @classmethod
+    def _request_tasks_in_list(cls, list, saved_validators, completed_since=None):
+        """
+        Starts retrieving the positions and each collection of tasks in the
+        list, skipping collections that are unchanged since they were saved
+        """
+        from wunderlist.api import reminders, tasks
+
+        def saved_validator(kind):
+            validator = saved_validators.get((list.id, _collection_kind(kind, completed_since)))
+
+            # All completed tasks were saved, which includes the window
+            if validator is None and completed_since:
+                validator = saved_validators.get((list.id, kind))
+
+            return validator
+
+        collections = _synced_collections()
+        positions_jobs = tasks.request_task_positions(
+            list.id, subtasks=any(kind == SUBTASKS for (kind, params) in collections))
+        tasks_jobs = []
+
+        for (kind, params) in collections:
+            if kind == REMINDERS:
+                tasks_jobs.append(reminders.request_reminders(list.id, saved_validator(kind)))
+            else:
+                tasks_jobs.append(tasks.request_tasks(list.id, saved_validator=saved_validator(kind), **params))
+
+        return (positions_jobs, tasks_jobs)
+
+    @classmethod
+    def _tasks_in_list(cls, list, positions_jobs, tasks_jobs, completed_since=None):
+        """
+        Combines the retrieved tasks with their order. Returns the positions
+        revision with the order of each task, and the kind, validator and
+        tasks of each collection, with None in place of the tasks of an
+        unchanged collection. Tasks completed before completed_since are left
+        out.
+        """
+        from wunderlist.api import tasks
+
+        positions = tasks.task_positions(list.id, positions_jobs)
+        position_by_task_id = positions[1]
+        collections = []
+        task_count = 0
+
+        for ((kind, params), job) in zip(_synced_collections(), tasks_jobs):
+            (validator, tasks_data) = job.result()
+            kind = _collection_kind(kind, completed_since)
+
+            if tasks_data is not None and kind != REMINDERS:
+                if kind == RECENTLY_COMPLETED_TASKS:
+                    tasks_data = [task for task in tasks_data
+                                  if (task.get('completed_at') or '') >= completed_since]
+
+                for task in tasks_data:
+                    task['order'] = position_by_task_id.get(task['id'])
+                task_count += len(tasks_data)
+
+            collections.append((kind, validator, tasks_data))
+
+        log.info('Retrieved %d changed tasks for %s', task_count, list)
+
+        return (positions, collections)
+
+    @classmethod
+    def sync_subtasks_in_list(cls, list):
+        """
+        Retrieves and saves the subtasks in the list unless they are still
+        current. Returns True if the subtasks had to be retrieved.
+        """
+        from wunderlist.api import tasks
+
+        saved_validators = TaskCollection.validators([list.id])
+
+        if (list.id, CURRENT_SUBTASKS) in saved_validators:
+            return False
+
+        positions_jobs = tasks.request_subtask_positions(list.id)
+        job = tasks.request_tasks(list.id, subtasks=True,
+                                  saved_validator=saved_validators.get((list.id, SUBTASKS)))
+        positions = tasks.task_positions(list.id, positions_jobs)
+        (validator, tasks_data) = job.result()
+
+        if tasks_data is not None:
+            for task in tasks_data:
+                task['order'] = positions[1].get(task['id'])
+
+        cls._update_tasks_in_list(list, positions, [(SUBTASKS, validator, tasks_data)],
+                                  saved_validators.get((list.id, SUBTASK_POSITIONS)),
+                                  SUBTASK_POSITIONS)
+
+        return True
+
+    @classmethod
+    def _update_tasks_in_list(cls, list, positions, collections, saved_positions_revision=None,
+                              positions_kind=POSITIONS, index=None):
+        """
+        Saves the collections of tasks in the list. The index of saved tasks
+        is read from the database unless one is shared by the whole sync.
+        """
+        start = time.time()
+        (positions_revision, position_by_task_id) = positions
         instances = []
-        tasks_data = []
-        position_by_task_id = {}
-
-        with futures.ThreadPoolExecutor(max_workers=4) as executor:
-            positions_job = executor.submit(tasks.task_positions, list.id)
-            jobs = (
-                executor.submit(tasks.tasks, list.id, completed=False),
-                executor.submit(tasks.tasks, list.id, completed=True),
-                executor.submit(tasks.tasks, list.id, subtasks=True)
+        reminders = [collection for collection in collections if collection[0] == REMINDERS]
+        collections = [collection for collection in collections if collection[0] != REMINDERS]
+        changed_kinds = [kind for (kind, validator, tasks_data) in collections if tasks_data is not None]
+
+        if index is None:
+            index = RevisionIndex.load()
+
+        if changed_kinds:
+            # Only tasks in changed collections may have been removed; tasks
+            # referenced in the data that were moved from a different list or
+            # collection are resolved from the index while performing updates
+            instances = [cls(id=id, revision=index.revision(id))
+                         for id in index.in_collections(list.id, changed_kinds)]
+
+        log.info('Loaded all %d tasks in changed collections of %s from the database in %s',
+                 len(instances), list, time.time() - start)
+        start = time.time()
+
+        # Commit the whole list at once rather than a transaction per batch
+        with cls._meta.database.atomic():
+            if changed_kinds:
+                tasks_data = itertools.chain(*[tasks_data for (kind, validator, tasks_data) in collections
+                                               if tasks_data is not None])
+                cls._perform_updates(instances, tasks_data, index)
+
+            # Tasks are reordered if the positions changed, e.g. when tasks
+            # were only rearranged. Tasks in changed collections are included
+            # since those that are otherwise unchanged were not saved.
+            if positions_revision != saved_positions_revision:
+                kinds = [kind for (kind, validator, tasks_data) in collections]
+
+                for id in index.in_collections(list.id, kinds):
+                    order = position_by_task_id.get(id)
+
+                    if index.order(id) != order:
+                        cls.update(order=order).where(cls.id == id).execute()
+                        index.reordered(id, order)
+
+            for (kind, validator, reminders_data) in reminders:
+                if reminders_data is not None:
+                    cls._update_reminders_in_list(list, reminders_data, index)
+
+            validators = dict(
+                (kind, validator) for (kind, validator, tasks_data) in collections + reminders
+                if tasks_data is not None
             )
+            validators[positions_kind] = positions_revision
 
-            for job in futures.as_completed(jobs):
-                tasks_data += job.result()
+            # Subtasks saved previously may have changed along with the list
+            if any(kind == SUBTASKS for (kind, validator, tasks_data) in collections):
+                validators[CURRENT_SUBTASKS] = '1'
+            else:
+                validators[CURRENT_SUBTASKS] = None
 
-            position_by_task_id = dict((id, index) for (id, index) in enumerate(positions_job.result()))
+            # Only one version of the completed tasks is saved at a time. A
+            # window is recorded even without a validator so that it can be
+            # backfilled; an empty validator never matches a response.
+            if RECENTLY_COMPLETED_TASKS in validators:
+                validators[RECENTLY_COMPLETED_TASKS] = validators[RECENTLY_COMPLETED_TASKS] or '{}'
+                validators[COMPLETED_TASKS] = None
+            elif COMPLETED_TASKS in validators:
+                validators[RECENTLY_COMPLETED_TASKS] = None
 
-        log.info('Retrieved all %d tasks for %s in %s', len(tasks_data), list, time.time() - start)
-        start = time.time()
+            TaskCollection.save_validators(list.id, validators)
 
-        def task_order(task):
-            task['order'] = position_by_task_id.get(task['id'])
-            return task['order'] or 1e99
+        log.info('Completed updates to tasks in %s in %s', list, time.time() - start)
 
-        tasks_data.sort(key=task_order)
+    @classmethod
+    def _update_reminders_in_list(cls, list, reminders_data, index):
+        """
+        Saves the reminders of the tasks in the list, which must already have
+        been saved. Reminders of tasks that are not saved, e.g. completed
+        tasks outside of the window, are left out.
+        """
+        from wunderlist.models.reminder import Reminder
+
+        task_ids = index.top_level_ids(list.id)
+        reminders_data = [reminder for reminder in reminders_data if reminder['task_id'] in task_ids]
+        instances = []
 
         try:
-            # Include all tasks thought to be in the list, plus any additional
-            # tasks referenced in the data (task may have been moved to a different list)
-            ParentTask = cls.alias()
-            task_ids = [task['id'] for task in tasks_data]
-            instances = cls.select(cls.id, cls.title, cls.revision)\
-                .join(ParentTask, JOIN.LEFT_OUTER)\
-                .where(
-                    (ParentTask.list == list.id) |
-                    (cls.list == list.id) |
-                    (cls.id.in_(task_ids)) |
-                    (cls.task.in_(task_ids))
-                )
+            instances = Reminder.select(Reminder.id, Reminder.revision)\
+                .join(cls)\
+                .where(cls.list == list.id)
         except PeeweeException:
             pass
 
-        log.info('Loaded all %d tasks for %s from the database in %s', len(instances), list, time.time() - start)
-        start = time.time()
+        Reminder._perform_updates(instances, reminders_data)
 
-        cls._perform_updates(instances, tasks_data)
+    @classmethod
+    def _delete_orphaned_reminders(cls):
+        """
+        Deletes the reminders of tasks that were deleted, which no longer
+        belong to any list. This scans every reminder, so it is done once
+        after all of the lists are saved.
+        """
+        from wunderlist.models.reminder import Reminder
 
-        log.info('Completed updates to tasks in %s in %s', list, time.time() - start)
+        Reminder.delete().where(Reminder.task.not_in(cls.select(cls.id))).execute()
 
-        return None
+    @classmethod
+    def backfill_completed_tasks(cls):
+        """
+        Makes the next sync save the completed tasks again in lists whose
+        completed tasks were limited to a window, e.g. all of them once
+        completed tasks are visible or those within a new window. Returns
+        True if any lists will be synced again.
+        """
+        from wunderlist.models.root import Root
+        from wunderlist.sync import invalidate_revision
+
+        try:
+            list_ids = [collection.list_id for collection in
+                        TaskCollection.select(TaskCollection.list_id)
+                        .where(TaskCollection.kind == RECENTLY_COMPLETED_TASKS)]
+        except PeeweeException:
+            return False
+
+        if not list_ids:
+            return False
+
+        log.info('Backfilling completed tasks in %d lists', len(list_ids))
+
+        # The lists must appear to have changed for their tasks to be synced
+        with cls._meta.database.atomic():
+            TaskCollection.delete()\
+                .where(TaskCollection.kind == RECENTLY_COMPLETED_TASKS)\
+                .execute()
+            List.update(revision=0).where(List.id << list_ids).execute()
+            Root.update(revision=0).execute()
+
+        invalidate_revision()
+
+        return True
 
     @classmethod
     def due_today(cls):
@@ -201,8 +497,110 @@ class Task(BaseModel):
         return '   '.join(subtitle)
 
     def __str__(self):
-        title = self.title if len(self.title) <= 20 else self.title[:20].rstrip() + u'…'
+        title = self.title or u''
+        title = title if len(title) <= 20 else title[:20].rstrip() + u'…'
         return u'<%s %d %s>' % (type(self).__name__, self.id, title)
 
     class Meta(object):
         order_by = ('order', 'id')
+
+
+class RevisionIndex(object):
+    """
+    The list, parent, revision, completion and order of every saved task,
+    read in a single scan when the sync starts so that the tasks in each list
+    can be compared with the data without querying the database again. The
+    index is kept up-to-date as tasks are saved and deleted during the sync.
+    """
+
+    def __init__(self, rows=()):
+        # (list_id, parent_id, revision, completed, order) by task ID
+        self.tasks = {}
+        self.ids_by_list_id = {}
+        self.ids_by_parent_id = {}
+
+        for (id, list_id, parent_id, revision, completed, order) in rows:
+            self._add(id, list_id, parent_id, revision, completed, order)
+
+    @classmethod
+    def load(cls):
+        """
+        Reads every task that exists in Wunderlist. Tasks created in the
+        workflow that have not yet been sent have negative IDs and are left
+        out so that they are never deleted by a sync.
+        """
+        rows = []
+
+        try:
+            rows = list(Task.select(Task.id, Task.list, Task.task, Task.revision,
+                                    Task.completed_at.is_null(False), Task.order)
+                        .where(Task.id > 0)
+                        .tuples())
+        except PeeweeException:
+            pass
+
+        return cls(rows)
+
+    def revision(self, id):
+        task = self.tasks.get(id)
+
+        return task[2] if task else None
+
+    def order(self, id):
+        return self.tasks[id][4]
+
+    def in_collections(self, list_id, kinds):
+        """
+        The IDs of the saved tasks that belong to any of the collections of
+        the list. Subtasks belong to the list of their parent task.
+        """
+        top_level_ids = self.ids_by_list_id.get(list_id, ())
+        ids = []
+
+        for kind in set(kinds):
+            if kind == SUBTASKS:
+                for parent_id in top_level_ids:
+                    ids.extend(self.ids_by_parent_id.get(parent_id, ()))
+            else:
+                completed = kind in (COMPLETED_TASKS, RECENTLY_COMPLETED_TASKS)
+                ids.extend(id for id in top_level_ids if self.tasks[id][3] == completed)
+
+        return ids
+
+    def top_level_ids(self, list_id):
+        return self.ids_by_list_id.get(list_id, ())
+
+    def saved(self, rows):
+        """
+        Records tasks saved from the normalized task data
+        """
+        for row in rows:
+            self.deleted([row['id']])
+            self._add(row['id'], row['list'], row['task'], row['revision'],
+                      row['completed_at'] is not None, row['order'])
+
+    def deleted(self, ids):
+        for id in ids:
+            task = self.tasks.pop(id, None)
+
+            if task:
+                self._ids_of(task).discard(id)
+
+    def reordered(self, id, order):
+        self.tasks[id] = self.tasks[id][:4] + (order,)
+
+    def _add(self, id, list_id, parent_id, revision, completed, order):
+        task = (list_id, parent_id, revision, bool(completed), order)
+        self.tasks[id] = task
+        self._ids_of(task).add(id)
+
+    def _ids_of(self, task):
+        """
+        The set of top-level tasks in the list or subtasks of the parent task
+        to which the task belongs
+        """
+        (list_id, parent_id) = task[:2]
+
+        if parent_id is None:
+            return self.ids_by_list_id.setdefault(list_id, set())
+        return self.ids_by_parent_id.setdefault(parent_id, set())
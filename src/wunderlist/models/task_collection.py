@@ -0,0 +1,78 @@
+from peewee import CharField, IntegerField, TextField
+
+from wunderlist.models.base import BaseModel
+
+TASKS = 'tasks'
+COMPLETED_TASKS = 'completed_tasks'
+SUBTASKS = 'subtasks'
+
+# Completed tasks saved without those completed before the window set in
+# preferences, which are only saved once completed tasks are visible
+RECENTLY_COMPLETED_TASKS = 'recently_completed_tasks'
+
+# The reminders of tasks in the list, saved along with the tasks
+REMINDERS = 'reminders'
+
+# The task and subtask positions, whose validator is their revisions
+POSITIONS = 'positions'
+
+# The subtask positions when subtasks are retrieved separately from the rest
+# of the list
+SUBTASK_POSITIONS = 'subtask_positions'
+
+# Recorded while the saved subtasks of a list are up-to-date. Unless
+# subtasks are synced with their lists, this lasts until the list changes.
+CURRENT_SUBTASKS = 'current_subtasks'
+
+
+class TaskCollection(BaseModel):
+    """
+    The version of each collection of tasks in a list, e.g. its completed
+    tasks, that was last saved. A collection whose response has the same
+    validator does not need to be saved again.
+    """
+    id = CharField(primary_key=True)
+    list_id = IntegerField(index=True)
+    kind = CharField()
+    validator = TextField()
+
+    @classmethod
+    def validators(cls, list_ids):
+        """
+        Returns the saved validators keyed by (list_id, kind)
+        """
+        validators = {}
+        list_ids = list(list_ids)
+
+        for i in xrange(0, len(list_ids), 500):
+            for collection in cls.select().where(cls.list_id.in_(list_ids[i:i + 500])):
+                validators[(collection.list_id, collection.kind)] = collection.validator
+
+        return validators
+
+    @classmethod
+    def save_validators(cls, list_id, validators):
+        """
+        Records the validator of each collection in the list that was saved;
+        a collection without a validator must always be saved again
+        """
+        for (kind, validator) in validators.iteritems():
+            id = '%d/%s' % (list_id, kind)
+
+            if validator:
+                cls.insert(id=id, list_id=list_id, kind=kind, validator=validator)\
+                    .upsert().execute()
+            else:
+                cls.delete().where(cls.id == id).execute()
+
+    @classmethod
+    def invalidate(cls, list_id=None):
+        """
+        Makes the next sync save every collection in the list, or in all lists
+        """
+        query = cls.delete()
+
+        if list_id is not None:
+            query = query.where(cls.list_id == list_id)
+
+        query.execute()
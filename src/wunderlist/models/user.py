@@ -18,13 +18,15 @@ class User(BaseModel):
     created_at = DateTimeUTCField()
 
     @classmethod
-    def sync(cls):
+    def sync(cls, user_data=None):
         from wunderlist.api import user
 
         start = time.time()
         instance = None
-        user_data = user.user()
-        log.info('Retrieved User in %s', time.time() - start)
+
+        if user_data is None:
+            user_data = user.user()
+            log.info('Retrieved User in %s', time.time() - start)
 
         try:
             instance = cls.get()
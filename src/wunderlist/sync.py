@@ -5,13 +5,94 @@ import time
 from workflow.notify import notify
 from workflow.background import is_running
 
+from wunderlist.api import circuit, deadline
 from wunderlist.models.preferences import Preferences
 from wunderlist.util import workflow
 
 
+def _revision_file():
+    return workflow().cachefile('root_revision')
+
+
+def _cached_revision():
+    try:
+        with open(_revision_file(), 'rb') as f:
+            return int(f.read())
+    except (IOError, ValueError):
+        return None
+
+
+def _store_revision(revision):
+    path = _revision_file()
+    temp_path = '%s.%d' % (path, os.getpid())
+
+    with open(temp_path, 'wb') as f:
+        f.write(str(revision))
+    os.rename(temp_path, path)
+
+
+def _initial_sync_file():
+    """
+    Exists from the start of the initial sync until it has completed, even
+    if it is interrupted and resumed by a later sync
+    """
+    return workflow().datafile('initial_sync')
+
+
+def invalidate_revision():
+    """
+    Makes the next sync compare every list with Wunderlist rather than only
+    the root revision, e.g. when a change is waiting to be sent
+    """
+    try:
+        os.remove(_revision_file())
+    except OSError:
+        pass
+
+
+def last_sync():
+    """
+    The last time that the local data was known to be up-to-date
+    """
+    last_sync = Preferences.current_prefs().last_sync
+
+    try:
+        checked = datetime.fromtimestamp(os.path.getmtime(_revision_file()))
+    except OSError:
+        return last_sync
+
+    return max(last_sync, checked) if last_sync else checked
+
+
+def _probe():
+    """
+    Retrieves the root if the previous sync completed and nothing has changed
+    in the workflow since, otherwise returns None. Does not open the database.
+    """
+    from wunderlist.api import root
+
+    if _cached_revision() is None or not os.path.exists(workflow().datafile('wunderlist.db')):
+        return None
+
+    return root.root()
+
+
 def sync(background=False):
-    from wunderlist.models import base, root, list, task, user, hashtag, reminder
-    from peewee import OperationalError
+    # Fail fast while Wunderlist is unreachable. Only a background sync may
+    # probe whether the connection has been restored.
+    if circuit.is_open() or \
+       (not background and circuit.state() == circuit.HALF_OPEN):
+        if background:
+            return False
+        raise circuit.CircuitOpenError('Wunderlist is currently unreachable')
+
+    # Nothing has changed in Wunderlist or the workflow since the last sync
+    root_data = _probe()
+
+    if root_data and root_data['revision'] == _cached_revision():
+        # Records the time of the check for last_sync()
+        os.utime(_revision_file(), None)
+        return True
 
     # If a sync is already running, wait for it to finish. Otherwise, store
     # the current pid in alfred-workflow's pid cache file
@@ -19,6 +100,8 @@ def sync(background=False):
         if is_running('sync'):
             wait_count = 0
             while is_running('sync'):
+                # Give up waiting if the handler's latency budget runs out
+                deadline.check()
                 time.sleep(.25)
                 wait_count += 1
 
@@ -28,9 +111,37 @@ def sync(background=False):
             return False
 
         pidfile = workflow().cachefile('sync.pid')
+        pid = '{0}'.format(os.getpid())
 
         with open(pidfile, 'wb') as file_obj:
-            file_obj.write('{0}'.format(os.getpid()))
+            file_obj.write(pid)
+
+        try:
+            return _sync(background, root_data)
+        except deadline.DeadlineExceeded:
+            from wunderlist.api import base
+
+            # Requests that were queued for the sync would only delay the
+            # exit of this process
+            base.cancel_pending()
+            raise
+        finally:
+            # This process may continue running after the sync, e.g. to
+            # render results, and must not prevent a background sync
+            try:
+                with open(pidfile, 'rb') as file_obj:
+                    if file_obj.read() == pid:
+                        os.remove(pidfile)
+            except (IOError, OSError):
+                pass
+
+    return _sync(background, root_data)
+
+
+def _sync(background, root_data=None):
+    from wunderlist.models import (base, root, list, task, task_collection, user,
+                                   hashtag, reminder, mutation)
+    from peewee import OperationalError
 
     Preferences.current_prefs().last_sync = datetime.now()
 
@@ -40,7 +151,9 @@ def sync(background=False):
         task.Task,
         user.User,
         hashtag.Hashtag,
-        reminder.Reminder
+        reminder.Reminder,
+        mutation.Mutation,
+        task_collection.TaskCollection
     ], safe=True)
 
     # Perform a query that requires the latest schema; if it fails due to a
@@ -51,20 +164,44 @@ def sync(background=False):
     except OperationalError:
         base.BaseModel._meta.database.close()
         workflow().clear_data(lambda f: 'wunderlist.db' in f)
+        invalidate_revision()
 
         # Make sure that this sync does not try to wait until its own process
         # finishes
         sync(background=True)
         return
 
-    first_sync = False
-
     try:
         root.Root.get()
     except root.Root.DoesNotExist:
-        first_sync = True
+        open(_initial_sync_file(), 'wb').close()
 
-    root.Root.sync(background=background)
+    first_sync = os.path.exists(_initial_sync_file())
+
+    # Send changes made in the workflow before retrieving the latest data;
+    # sending any changes increments the root revision
+    if mutation.Mutation.flush():
+        root_data = None
+    last_mutation = mutation.Mutation.pending().order_by(mutation.Mutation.id.desc()).first()
+
+    root.Root.sync(background=background, root_data=root_data)
+
+    # Changes made while syncing would otherwise wait for the next sync
+    new_mutations = mutation.Mutation.pending()
+    if last_mutation:
+        new_mutations = new_mutations.where(mutation.Mutation.id > last_mutation.id)
+
+    if new_mutations.exists() and mutation.Mutation.flush():
+        root.Root.sync(background=background)
+
+    if first_sync:
+        os.remove(_initial_sync_file())
+
+    # Changes that could not be sent yet must be retried by the next sync
+    if mutation.Mutation.pending().exists():
+        invalidate_revision()
+    else:
+        _store_revision(root.Root.get().revision)
 
     if background:
         if first_sync:
@@ -80,6 +217,10 @@ def background_sync():
     from workflow.background import run_in_background
     task_id = 'sync'
 
+    # Avoid spawning a process that is certain to fail
+    if circuit.is_open():
+        return
+
     # Only runs if another sync is not already in progress
     run_in_background(task_id, [
         '/usr/bin/env',
@@ -91,9 +232,9 @@ def background_sync():
 
 
 def background_sync_if_necessary(seconds=30):
-    last_sync = Preferences.current_prefs().last_sync
+    last = last_sync()
 
     # Avoid syncing on every keystroke, background_sync will also prevent
     # multiple concurrent syncs
-    if last_sync is None or (datetime.now() - last_sync).total_seconds() > seconds:
+    if last is None or (datetime.now() - last).total_seconds() > seconds:
         background_sync()
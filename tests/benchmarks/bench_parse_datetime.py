@@ -0,0 +1,58 @@
+"""
+Compares parse_datetime with dateutil on the dates of a synthetic payload
+of 50,000 tasks. Run from the src directory:
+
+    PYTHONPATH=. python ../tests/benchmarks/bench_parse_datetime.py
+"""
+from datetime import datetime, timedelta
+import time
+
+from dateutil import parser
+
+from wunderlist.models.fields import parse_datetime
+
+TASK_COUNT = 50000
+
+
+def synthetic_tasks(count):
+	start = datetime(2015, 1, 1)
+	tasks = []
+
+	for i in xrange(count):
+		created_at = start + timedelta(minutes=i)
+		task = {
+			'id': i,
+			'created_at': created_at.strftime('%Y-%m-%dT%H:%M:%S.') + '%03dZ' % (i % 1000),
+			'due_date': (created_at + timedelta(days=7)).strftime('%Y-%m-%d')
+		}
+
+		if i % 3 == 0:
+			task['completed_at'] = (created_at + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+		tasks.append(task)
+
+	return tasks
+
+
+def benchmark(name, parse, values):
+	start = time.time()
+
+	for value in values:
+		parse(value)
+
+	elapsed = time.time() - start
+	print '%-16s %6.3fs  %5.2fus per value' % (name, elapsed, elapsed / len(values) * 1e6)
+
+	return elapsed
+
+
+if __name__ == '__main__':
+	values = [task[key] for task in synthetic_tasks(TASK_COUNT)
+			  for key in ('created_at', 'due_date', 'completed_at') if key in task]
+
+	assert all(parse_datetime(value) == parser.parse(value) for value in values[:1000])
+
+	print 'Parsing %d values from %d tasks' % (len(values), TASK_COUNT)
+	slow = benchmark('dateutil', parser.parse, values)
+	fast = benchmark('parse_datetime', parse_datetime, values)
+	print '%.1fx faster' % (slow / fast)
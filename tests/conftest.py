@@ -0,0 +1,23 @@
+from peewee import SqliteDatabase
+from playhouse.test_utils import test_database
+import pytest
+
+from wunderlist.models.hashtag import Hashtag
+from wunderlist.models.list import List
+from wunderlist.models.mutation import Mutation
+from wunderlist.models.reminder import Reminder
+from wunderlist.models.root import Root
+from wunderlist.models.task import Task
+from wunderlist.models.task_collection import TaskCollection
+from wunderlist.models.user import User
+
+@pytest.fixture()
+def database(request):
+	"""
+	Uses an empty in-memory database for every model
+	"""
+	context = test_database(SqliteDatabase(':memory:'), [User, List, Root, Task, Reminder,
+	                                                     Hashtag, TaskCollection, Mutation])
+	context.__enter__()
+
+	request.addfinalizer(lambda: context.__exit__(None, None, None))
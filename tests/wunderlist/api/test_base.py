@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+from requests import Response
+from requests.exceptions import ConnectionError, ConnectTimeout
+
+import wunderlist.api.base as api
+from wunderlist.api import deadline
+
+_token = 'abc123'
+
+@pytest.fixture(autouse=True)
+def mock_oauth_token(request, mocker):
+	"""
+	Provides a token without reading the Keychain
+	"""
+	mocker.patch('wunderlist.api.base.oauth_token', return_value=_token)
+	api.close()
+
+	request.addfinalizer(api.close)
+
+class TestSession():
+
+	def test_session_is_shared(self):
+		assert api.session() is api.session()
+
+	def test_session_has_default_headers(self):
+		headers = api.session().headers
+
+		assert headers['x-access-token'] == _token
+		assert headers['content-type'] == 'application/json'
+
+	def test_pool_size(self):
+		adapter = api.session().get_adapter('https://a.wunderlist.com')
+
+		assert adapter._pool_maxsize == api.MAX_CONNECTIONS
+
+	def test_close_creates_new_session(self):
+		s = api.session()
+		api.close()
+
+		assert api.session() is not s
+
+	def test_unauthorized_invalidates_token(self, mocker):
+		res = Response()
+		res.status_code = 401
+		res._content = ''
+		res._content_consumed = True
+		mocker.patch.object(api.session(), 'request', return_value=res)
+		invalidate = mocker.patch('wunderlist.api.base.invalidate_token_cache')
+		s = api.session()
+
+		api.get('user')
+
+		assert invalidate.called
+		assert api.session() is not s
+
+class TestCircuit():
+
+	@pytest.fixture()
+	def record_failure(self, mocker):
+		mocker.patch('wunderlist.api.retry.call', side_effect=lambda method, path, send: send())
+		mocker.patch('wunderlist.api.base.circuit.before_request')
+		mocker.patch('wunderlist.api.base.metrics.record')
+
+		return mocker.patch('wunderlist.api.base.circuit.record_failure')
+
+	def fail(self, mocker, error):
+		mocker.patch.object(api.session(), 'request', side_effect=error)
+
+		with pytest.raises(type(error)):
+			api.get('user')
+
+	def test_connection_error_is_recorded(self, mocker, record_failure):
+		self.fail(mocker, ConnectionError())
+
+		assert record_failure.called
+
+	def test_connect_timeout_is_recorded(self, mocker, record_failure):
+		self.fail(mocker, ConnectTimeout())
+
+		assert record_failure.called
+
+	def test_connect_timeout_within_deadline_is_not_recorded(self, mocker, record_failure):
+		with deadline.budget(3):
+			self.fail(mocker, ConnectTimeout())
+
+		assert not record_failure.called
+
+class TestExecutor():
+
+	def test_executor_is_shared(self):
+		assert api.executor() is api.executor()
+
+	def test_executor_size(self):
+		assert api.executor()._max_workers == api.MAX_CONNECTIONS
+
+	def test_get_many_in_order(self, mocker):
+		mocker.patch('wunderlist.api.base.get', side_effect=lambda path, params, **kwargs: (path, params, kwargs))
+
+		jobs = api.get_many([('lists', None), ('tasks', {'list_id': 1})], conditional=True)
+
+		assert [job.result() for job in jobs] == [
+			('lists', None, {'conditional': True, 'streamed': False}),
+			('tasks', {'list_id': 1}, {'conditional': True, 'streamed': False})
+		]
+
+	def test_job_keeps_caller_deadline(self):
+		started = threading.Event()
+
+		with deadline.budget(60):
+			job = api.submit(lambda: started.wait() and deadline.remaining())
+
+		started.set()
+
+		assert 0 < job.result() <= 60
+
+	def test_pending_jobs_are_cancelled(self):
+		started = threading.Semaphore(0)
+		release = threading.Event()
+
+		def wait():
+			started.release()
+			return release.wait()
+
+		running = [api.submit(wait) for _ in range(api.MAX_CONNECTIONS)]
+		queued = api.submit(lambda: None)
+
+		for _ in running:
+			started.acquire()
+
+		api.cancel_pending()
+		release.set()
+
+		assert queued.cancelled()
+		assert all(job.result() for job in running)
@@ -0,0 +1,119 @@
+from io import BytesIO
+import os
+import time
+
+import pytest
+from requests import Response
+
+import wunderlist.api.base as api
+from wunderlist.api import cache
+
+@pytest.fixture(autouse=True)
+def cache_dir(request, mocker, tmpdir):
+	"""
+	Stores cached responses in a temporary directory
+	"""
+	mocker.patch('wunderlist.api.cache._cache_dir', return_value=str(tmpdir))
+	mocker.patch('wunderlist.api.base.oauth_token', return_value='abc123')
+	cache._cache_size = None
+	api.close()
+
+	request.addfinalizer(api.close)
+
+	return tmpdir
+
+def response(body, status_code=200, etag='"1"'):
+	res = Response()
+	res.status_code = status_code
+	res._content = body
+	res._content_consumed = True
+	if etag:
+		res.headers['etag'] = etag
+
+	return res
+
+class TestCache():
+
+	def test_lookup_missing(self):
+		assert cache.lookup('tasks', {'list_id': 1}) is None
+
+	def test_store_and_lookup(self):
+		cache.store('tasks', {'list_id': 1}, response('[{"id": 1}]'))
+
+		entry = cache.lookup('tasks', {'list_id': 1})
+
+		assert entry['etag'] == '"1"'
+		assert entry['body'] == '[{"id": 1}]'
+		assert cache.lookup('tasks', {'list_id': 2}) is None
+
+	def test_response_without_validators_is_not_stored(self):
+		cache.store('tasks', {'list_id': 1}, response('[]', etag=None))
+
+		assert cache.lookup('tasks', {'list_id': 1}) is None
+
+	def test_least_recently_used_is_evicted(self, mocker):
+		mocker.patch('wunderlist.api.cache.MAX_CACHE_SIZE', new=200)
+		cache.store('tasks', {'list_id': 1}, response('a' * 40))
+		cache.store('tasks', {'list_id': 2}, response('b' * 40))
+
+		# Make the first entry the most recently used
+		old_time = time.time() - 100
+		os.utime(cache._entry_path('tasks', {'list_id': 2}), (old_time, old_time))
+		cache.lookup('tasks', {'list_id': 1})
+
+		cache.store('tasks', {'list_id': 3}, response('c' * 40))
+
+		assert cache.lookup('tasks', {'list_id': 1}) is not None
+		assert cache.lookup('tasks', {'list_id': 2}) is None
+		assert cache.lookup('tasks', {'list_id': 3}) is not None
+
+class TestConditionalGet():
+
+	def test_not_modified_uses_cached_body(self, mocker):
+		cache.store('lists', None, response('[{"id": 5}]'))
+		request = mocker.patch.object(api.session(), 'request', return_value=response('', status_code=304))
+
+		req = api.get('lists', conditional=True)
+
+		assert request.call_args[1]['headers'] == {'If-None-Match': '"1"'}
+		assert req.status_code == 200
+		assert req.json() == [{'id': 5}]
+
+	def test_modified_response_is_stored(self, mocker):
+		mocker.patch.object(api.session(), 'request', return_value=response('[{"id": 6}]', etag='"2"'))
+
+		api.get('lists', conditional=True)
+
+		assert cache.lookup('lists')['etag'] == '"2"'
+
+	def test_streamed_response_is_stored_when_read(self, mocker):
+		res = response(False, etag='"3"')
+		res._content_consumed = False
+		res.raw = BytesIO('[{"id": 7}, {"id": 8}]')
+		mocker.patch.object(api.session(), 'request', return_value=res)
+
+		items = api.iter_json(api.get('lists', conditional=True, streamed=True))
+
+		assert next(items) == {'id': 7}
+		assert cache.lookup('lists') is None
+		assert list(items) == [{'id': 8}]
+		assert cache.lookup('lists')['body'] == '[{"id": 7}, {"id": 8}]'
+
+	def test_not_modified_stream_uses_cached_body(self, mocker):
+		cache.store('lists', None, response('[{"id": 5}]'))
+		mocker.patch.object(api.session(), 'request', return_value=response('', status_code=304))
+
+		req = api.get('lists', conditional=True, streamed=True)
+
+		assert list(api.iter_json(req)) == [{'id': 5}]
+
+	def test_validator_identifies_body(self, mocker):
+		request = mocker.patch.object(api.session(), 'request', return_value=response('[{"id": 5}]', etag='"4"'))
+
+		modified = api.get('lists', conditional=True)
+
+		request.return_value = response('', status_code=304)
+		not_modified = api.get('lists', conditional=True)
+
+		assert modified.validator is not None
+		assert not_modified.validator == modified.validator
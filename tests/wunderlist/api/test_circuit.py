@@ -0,0 +1,72 @@
+import pytest
+
+from wunderlist.api import circuit
+
+@pytest.fixture(autouse=True)
+def state_file(mocker, tmpdir):
+	"""
+	Stores the circuit state in a temporary directory
+	"""
+	mocker.patch('wunderlist.api.circuit._state_file', return_value=str(tmpdir.join('circuit.json')))
+
+@pytest.fixture()
+def now(mocker):
+	clock = mocker.patch('wunderlist.api.circuit.time.time')
+	clock.return_value = 1000.0
+
+	return clock
+
+def fail(times):
+	for _ in range(times):
+		circuit.record_failure()
+
+class TestCircuit():
+
+	def test_closed_by_default(self):
+		assert circuit.state() == circuit.CLOSED
+		circuit.before_request()
+
+	def test_opens_after_consecutive_failures(self, now):
+		fail(circuit.FAILURE_THRESHOLD - 1)
+
+		assert circuit.state() == circuit.CLOSED
+
+		fail(1)
+
+		assert circuit.is_open()
+		with pytest.raises(circuit.CircuitOpenError):
+			circuit.before_request()
+
+	def test_success_resets_failures(self, now):
+		fail(circuit.FAILURE_THRESHOLD - 1)
+		circuit.record_success()
+		fail(circuit.FAILURE_THRESHOLD - 1)
+
+		assert circuit.state() == circuit.CLOSED
+
+	def test_half_open_after_cooldown(self, now):
+		fail(circuit.FAILURE_THRESHOLD)
+		now.return_value += circuit.COOLDOWN
+
+		assert circuit.state() == circuit.HALF_OPEN
+		assert not circuit.is_open()
+		circuit.before_request()
+
+	def test_failed_probe_extends_cooldown(self, now):
+		fail(circuit.FAILURE_THRESHOLD)
+		now.return_value += circuit.COOLDOWN
+		fail(1)
+		now.return_value += circuit.COOLDOWN
+
+		assert circuit.is_open()
+
+		now.return_value += circuit.COOLDOWN
+
+		assert circuit.state() == circuit.HALF_OPEN
+
+	def test_successful_probe_closes(self, now):
+		fail(circuit.FAILURE_THRESHOLD)
+		now.return_value += circuit.COOLDOWN
+		circuit.record_success()
+
+		assert circuit.state() == circuit.CLOSED
@@ -0,0 +1,49 @@
+import pytest
+
+from wunderlist.api import deadline
+
+class TestDeadline():
+
+	def test_no_budget(self):
+		assert deadline.remaining() is None
+		assert deadline.timeout() == (deadline.CONNECT_TIMEOUT, deadline.READ_TIMEOUT)
+
+	def test_timeout_is_bounded_by_budget(self):
+		with deadline.budget(2):
+			(connect, read) = deadline.timeout()
+
+			assert 0 < connect <= 2
+			assert 0 < read <= 2
+
+		assert deadline.remaining() is None
+
+	def test_nested_budget_cannot_extend_deadline(self):
+		with deadline.budget(1):
+			with deadline.budget(60):
+				assert deadline.remaining() <= 1
+
+	def test_expired_budget(self):
+		with deadline.budget(0):
+			assert deadline.expired()
+
+			with pytest.raises(deadline.DeadlineExceeded):
+				deadline.timeout()
+
+			with pytest.raises(deadline.DeadlineExceeded):
+				deadline.check()
+
+	def test_inherited_after_budget_ends(self):
+		with deadline.budget(60):
+			remaining = deadline.inherit(deadline.remaining)
+
+		assert deadline.remaining() is None
+		assert 0 < remaining() <= 60
+
+	def test_inherited_budget_does_not_change_shared_deadline(self):
+		def nested():
+			with deadline.budget(1):
+				return deadline.remaining()
+
+		with deadline.budget(60):
+			assert deadline.inherit(nested)() <= 1
+			assert deadline.remaining() > 1
@@ -0,0 +1,33 @@
+from wunderlist.api import metrics
+
+def sample(endpoint, status=200, latency=0.1, size=0, retries=0):
+	return [0, endpoint, status, latency, size, retries]
+
+class TestMetrics():
+
+	def test_endpoint_groups_ids(self):
+		assert metrics.endpoint('patch', 'tasks/1234') == 'PATCH tasks/:id'
+		assert metrics.endpoint('GET', 'lists/tasks_count') == 'GET lists/tasks_count'
+
+	def test_streamed_bytes_are_added(self):
+		s = metrics.record('GET', 'tasks', 200, 0.1)
+		metrics.add_bytes(s, 10)
+		metrics.add_bytes(s, 5)
+
+		assert s[metrics.BYTES] == 15
+
+	def test_summary(self):
+		samples = [sample('GET tasks', latency=i / 100.0, size=10) for i in range(1, 101)]
+		samples.append(sample('GET root', status=304, retries=2))
+
+		stats = metrics.summary(samples)
+		tasks = stats[0]
+
+		assert tasks['endpoint'] == 'GET tasks'
+		assert tasks['count'] == 100
+		assert tasks['p50'] == 0.51
+		assert tasks['p95'] == 0.95
+		assert tasks['p99'] == 0.99
+		assert tasks['bytes'] == 1000
+		assert stats[1]['statuses'] == {304: 1}
+		assert stats[1]['retries'] == 2
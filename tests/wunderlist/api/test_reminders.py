@@ -0,0 +1,40 @@
+from io import BytesIO
+
+import pytest
+from requests import Response
+
+import wunderlist.api.base as api
+from wunderlist.api import reminders
+
+@pytest.fixture(autouse=True)
+def mock_get(mocker):
+	"""
+	Responds to every request with one reminder
+	"""
+	def get(path, params=None, conditional=False, streamed=False):
+		res = Response()
+		res.status_code = 200
+		res.raw = BytesIO('[{"id": 1, "task_id": 2}]')
+		res.validator = '{"etag": "1"}'
+		return res
+
+	return mocker.patch('wunderlist.api.base.get', side_effect=get)
+
+class TestRequestReminders():
+
+	def test_reminders_in_list(self):
+		(validator, reminders_data) = reminders.request_reminders(3).result()
+
+		assert validator == '{"etag": "1"}'
+		assert reminders_data == [{'id': 1, 'task_id': 2}]
+		assert api.get.call_args[0][1]['list_id'] == 3
+
+	def test_response_is_not_streamed(self):
+		reminders.request_reminders(3).result()
+
+		assert not api.get.call_args[1].get('streamed')
+
+	def test_unchanged_reminders_are_not_read(self):
+		(validator, reminders_data) = reminders.request_reminders(3, '{"etag": "1"}').result()
+
+		assert reminders_data is None
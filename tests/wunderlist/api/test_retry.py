@@ -0,0 +1,159 @@
+from io import BytesIO
+
+import pytest
+from requests import Response
+from requests.exceptions import ConnectionError, ConnectTimeout
+
+from wunderlist.api import deadline, retry
+
+@pytest.fixture(autouse=True)
+def no_sleep(mocker):
+	"""
+	Avoids waiting between attempts
+	"""
+	return mocker.patch('wunderlist.api.retry.time.sleep')
+
+@pytest.fixture(autouse=True)
+def mock_bucket(mocker):
+	"""
+	Avoids sharing the rate limit between tests
+	"""
+	return mocker.patch('wunderlist.api.retry._bucket')
+
+def response(status_code, retry_after=None):
+	res = Response()
+	res.status_code = status_code
+	res.raw = BytesIO()
+	if retry_after is not None:
+		res.headers['retry-after'] = retry_after
+
+	return res
+
+def sender(*results):
+	"""
+	Returns each result in turn, raising any exceptions
+	"""
+	results = list(results)
+	calls = []
+
+	def send():
+		calls.append(True)
+		result = results.pop(0)
+		if isinstance(result, Exception):
+			raise result
+		return result
+
+	send.calls = calls
+
+	return send
+
+class TestPolicy():
+
+	def test_get_is_idempotent(self):
+		assert retry.policy('get', 'tasks').idempotent
+
+	def test_post_is_not_idempotent(self):
+		assert not retry.policy('POST', 'tasks').idempotent
+
+	def test_endpoint_ignores_ids(self):
+		assert retry.endpoint('tasks/1234') == 'tasks'
+
+	def test_root_override(self):
+		assert retry.policy('GET', 'root').max_attempts == 2
+
+	def test_retry_after_seconds(self):
+		assert retry.retry_after(response(429, '3')) == 3
+
+	def test_retry_after_missing(self):
+		assert retry.retry_after(response(429)) is None
+
+class TestCall():
+
+	def test_success_is_not_retried(self):
+		send = sender(response(200))
+
+		assert retry.call('GET', 'tasks', send).status_code == 200
+		assert len(send.calls) == 1
+
+	def test_server_error_is_retried_for_get(self):
+		send = sender(response(503), response(200))
+
+		assert retry.call('GET', 'tasks', send).status_code == 200
+		assert len(send.calls) == 2
+
+	def test_failed_response_is_closed_before_retry(self, mocker):
+		failed = response(503)
+		succeeded = response(200)
+		mocker.patch.object(failed, 'close')
+		mocker.patch.object(succeeded, 'close')
+
+		retry.call('GET', 'tasks', sender(failed, succeeded))
+
+		assert failed.close.called
+		assert not succeeded.close.called
+
+	def test_server_error_is_not_retried_for_post(self):
+		send = sender(response(503), response(200))
+
+		assert retry.call('POST', 'tasks', send).status_code == 503
+		assert len(send.calls) == 1
+
+	def test_throttled_post_is_retried(self, no_sleep, mock_bucket):
+		send = sender(response(429, '2'), response(201))
+
+		assert retry.call('POST', 'tasks', send).status_code == 201
+		no_sleep.assert_any_call(2.0)
+		mock_bucket.pause.assert_called_with(2.0)
+
+	def test_long_retry_after_is_not_honored(self):
+		send = sender(response(429, str(retry.MAX_RETRY_AFTER + 1)), response(200))
+
+		assert retry.call('GET', 'tasks', send).status_code == 429
+
+	def test_connection_error_is_retried_for_get(self):
+		send = sender(ConnectionError(), response(200))
+
+		assert retry.call('GET', 'tasks', send).status_code == 200
+
+	def test_connection_error_is_raised_for_post(self):
+		send = sender(ConnectionError(), response(201))
+
+		with pytest.raises(ConnectionError):
+			retry.call('POST', 'tasks', send)
+
+	def test_connect_timeout_is_retried_for_post(self):
+		send = sender(ConnectTimeout(), response(201))
+
+		assert retry.call('POST', 'tasks', send).status_code == 201
+
+	def test_gives_up_after_max_attempts(self):
+		send = sender(*[response(500)] * 10)
+
+		assert retry.call('GET', 'tasks', send).status_code == 500
+		assert len(send.calls) == retry.RetryPolicy().max_attempts
+
+	def test_no_retry_beyond_deadline(self):
+		send = sender(response(503, '2'), response(200))
+
+		with deadline.budget(1):
+			assert retry.call('GET', 'tasks', send).status_code == 503
+
+class TestTokenBucket():
+
+	def test_burst_does_not_wait(self, no_sleep):
+		bucket = retry.TokenBucket(1, 3)
+
+		for _ in range(3):
+			bucket.acquire()
+
+		assert not no_sleep.called
+
+	def test_gives_up_at_deadline(self, no_sleep):
+		bucket = retry.TokenBucket(0.1, 1)
+		bucket.acquire()
+
+		with deadline.budget(0.05):
+			with pytest.raises(deadline.DeadlineExceeded):
+				bucket.acquire()
+
+		assert no_sleep.call_args[0][0] <= 0.05
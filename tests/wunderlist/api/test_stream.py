@@ -0,0 +1,55 @@
+# encoding: utf-8
+
+import json
+
+import pytest
+
+from wunderlist.api.stream import iter_array
+
+_tasks = [
+	{'id': 1, 'title': u'Buy milk', 'revision': 3},
+	{'id': 2, 'title': u'Jardinería', 'starred': True},
+	{'id': 3, 'title': u'Nested [brackets], "quotes" and {braces}'}
+]
+
+def chunked(text, size):
+	data = text.encode('utf-8')
+	return [data[i:i + size] for i in range(0, len(data), size)]
+
+class TestIterArray():
+
+	@pytest.mark.parametrize('size', [1, 2, 7, 4096])
+	def test_chunk_sizes(self, size):
+		assert list(iter_array(chunked(json.dumps(_tasks), size))) == _tasks
+
+	def test_empty_array(self):
+		assert list(iter_array(chunked(' [ ] ', 1))) == []
+
+	def test_whitespace(self):
+		text = '\n[\n  %s ,\n  %s\n]\n' % (json.dumps(_tasks[0]), json.dumps(_tasks[1]))
+
+		assert list(iter_array(chunked(text, 3))) == _tasks[:2]
+
+	def test_numbers_split_across_chunks(self):
+		assert list(iter_array(['[12', '34, 5', '6]'])) == [1234, 56]
+
+	def test_items_are_yielded_before_the_end(self):
+		chunks = iter(chunked(json.dumps(_tasks), 16))
+		items = iter_array(chunks)
+
+		assert next(items) == _tasks[0]
+		assert next(chunks, None) is not None
+
+	def test_remainder_is_read(self):
+		chunks = iter(['[1]', ' ', ' '])
+
+		assert list(iter_array(chunks)) == [1]
+		assert next(chunks, None) is None
+
+	def test_truncated_array(self):
+		with pytest.raises(ValueError):
+			list(iter_array(chunked(json.dumps(_tasks)[:-5], 8)))
+
+	def test_not_an_array(self):
+		with pytest.raises(ValueError):
+			list(iter_array(['{"id": 1}']))
@@ -0,0 +1,72 @@
+from io import BytesIO
+
+import pytest
+from requests import Response
+
+import wunderlist.api.base as api
+from wunderlist.api import tasks
+
+@pytest.fixture(autouse=True)
+def mock_get(mocker):
+	"""
+	Responds to every request with two tasks
+	"""
+	def get(path, params=None, conditional=False, streamed=False):
+		res = Response()
+		res.status_code = 200
+		res.raw = BytesIO('[{"id": 1}, {"id": 2}]')
+		res.validator = '{"etag": "1"}'
+		return res
+
+	return mocker.patch('wunderlist.api.base.get', side_effect=get)
+
+class TestRequestTasks():
+
+	def test_tasks_and_validator(self):
+		(validator, tasks_data) = tasks.request_tasks(1).result()
+
+		assert validator == '{"etag": "1"}'
+		assert tasks_data == [{'id': 1}, {'id': 2}]
+
+	def test_unchanged_tasks_are_not_read(self):
+		(validator, tasks_data) = tasks.request_tasks(1, saved_validator='{"etag": "1"}').result()
+
+		assert validator == '{"etag": "1"}'
+		assert tasks_data is None
+
+	def test_changed_tasks_are_read(self):
+		(validator, tasks_data) = tasks.request_tasks(1, completed=True, saved_validator='{"etag": "0"}').result()
+
+		assert tasks_data == [{'id': 1}, {'id': 2}]
+		assert api.get.call_args[0][1]['completed'] is True
+
+	def test_response_is_not_streamed(self):
+		tasks.request_tasks(1).result()
+
+		assert not api.get.call_args[1].get('streamed')
+
+class TestTaskPositions():
+
+	def test_positions_of_every_parent(self, mocker):
+		def get(path, params=None, conditional=False, streamed=False):
+			res = Response()
+			res.status_code = 200
+			if path == 'task_positions':
+				res.raw = BytesIO('[{"id": 10, "revision": 2, "values": [3, 1]}]')
+			else:
+				res.raw = BytesIO('[{"id": 11, "revision": 1, "values": [4]}, {"id": 12, "revision": 5, "values": [6, 5]}]')
+			return res
+
+		api.get.side_effect = get
+
+		(revision, position_by_task_id) = tasks.task_positions(1)
+
+		assert revision == '10:2,11:1,12:5'
+		assert position_by_task_id == {3: 0, 1: 1, 4: 0, 6: 0, 5: 1}
+
+	def test_subtask_positions_can_be_left_out(self, mocker):
+		get_many = mocker.patch('wunderlist.api.base.get_many')
+
+		tasks.request_task_positions(1, subtasks=False)
+
+		assert [path for (path, params) in get_many.call_args[0][0]] == ['task_positions']
@@ -0,0 +1,122 @@
+from datetime import datetime
+
+from dateutil.tz import tzutc
+import pytest
+
+from wunderlist.models.hashtag import Hashtag
+from wunderlist.models.list import List
+from wunderlist.models.reminder import Reminder
+
+def hashtag_data(ids, revision=0):
+	return [{'id': '#%d' % id, 'tag': '#%d' % id, 'revision': revision} for id in ids]
+
+@pytest.fixture(autouse=True)
+def small_batches(mocker):
+	"""
+	Makes every statement split into several batches
+	"""
+	mocker.patch('wunderlist.models.base.SQLITE_MAX_VARIABLES', 10)
+
+@pytest.mark.usefixtures('database')
+class TestPerformUpdates():
+
+	def test_items_created_in_batches(self):
+		instances = Hashtag._perform_updates([], hashtag_data(range(25)))
+
+		assert Hashtag.select().count() == 25
+		assert sorted(instance.id for instance in instances) == sorted('#%d' % id for id in range(25))
+
+	def test_changed_items_replaced(self):
+		Hashtag._perform_updates([], hashtag_data(range(25)))
+		changed = hashtag_data(range(25), 1)
+		changed[0]['tag'] = '#Changed'
+
+		Hashtag._perform_updates(Hashtag.select(), changed)
+
+		assert Hashtag.select().where(Hashtag.revision == 1).count() == 25
+		assert Hashtag.get(Hashtag.id == '#0').tag == '#Changed'
+
+	def test_missing_items_deleted_in_batches(self):
+		Hashtag._perform_updates([], hashtag_data(range(25)))
+
+		Hashtag._perform_updates(Hashtag.select(), hashtag_data(range(3)))
+
+		assert sorted(hashtag.id for hashtag in Hashtag.select()) == ['#0', '#1', '#2']
+
+	def test_unchanged_items_not_returned(self):
+		Hashtag._perform_updates([], hashtag_data(range(3)))
+
+		assert Hashtag._perform_updates(Hashtag.select(), hashtag_data(range(3))) == []
+
+class TestApiMapper():
+
+	def test_compiled_once_per_model(self):
+		assert Reminder._mapper() is Reminder._mapper()
+		assert Reminder._mapper() is not Hashtag._mapper()
+
+	def test_relationships_mapped_by_id(self):
+		row = Reminder._api2model({'id': 1, 'task_id': 2, 'revision': 1})
+
+		assert row['task'] == 2
+
+	def test_dates_parsed(self):
+		row = Reminder._api2model({'id': 1, 'date': '2016-01-02T12:00:00.000Z'})
+
+		assert row['date'] == datetime(2016, 1, 2, 12, tzinfo=tzutc())
+
+	def test_defaults_for_missing_keys(self):
+		row = List._api2model({'id': 1, 'title': 'List'})
+
+		assert row['completed_count'] == 0
+		assert 'title' in row
+
+	def test_unknown_keys_ignored(self):
+		assert 'type' not in Hashtag._api2model({'id': '#a', 'type': 'hashtag'})
+
+	def test_values_in_column_order(self):
+		mapper = Hashtag._mapper()
+
+		assert mapper.insert_sql == 'INSERT OR REPLACE INTO "hashtag" ("id", "tag", "revision") VALUES (?, ?, ?)'
+		assert mapper.values([{'id': '#a', 'tag': '#A', 'revision': 0}]) == [('#a', '#A', 0)]
+
+class TestNormalizeItems():
+
+	def test_items_normalized_as_received_by_default(self, database, mocker):
+		normalized = []
+		api2model = Hashtag._api2model
+		mocker.patch.object(Hashtag, '_api2model', side_effect=lambda item: normalized.append(item) or api2model(item))
+
+		def stream():
+			for item in hashtag_data(range(3)):
+				yield item
+				assert normalized[-1] is item
+
+		Hashtag._perform_updates([], stream())
+
+		assert len(normalized) == 3
+
+	def test_many_items_normalized_in_processes(self, mocker):
+		mocker.patch('wunderlist.models.base.PROCESS_POOL_THRESHOLD', 2)
+		mocker.patch('multiprocessing.cpu_count', return_value=2)
+		items = hashtag_data(range(25))
+
+		rows = Hashtag._normalize_items(items)
+
+		assert rows == [Hashtag._api2model(item) for item in items]
+
+	def test_few_items_normalized_on_calling_thread(self, mocker):
+		mocker.patch('wunderlist.models.base.PROCESS_POOL_THRESHOLD', 100)
+		pool = mocker.patch('concurrent.futures.ProcessPoolExecutor')
+
+		Hashtag._normalize_items(hashtag_data(range(25)))
+
+		assert not pool.called
+
+	def test_single_core_normalized_on_calling_thread(self, mocker):
+		mocker.patch('wunderlist.models.base.PROCESS_POOL_THRESHOLD', 2)
+		mocker.patch('multiprocessing.cpu_count', return_value=1)
+		pool = mocker.patch('concurrent.futures.ProcessPoolExecutor')
+
+		Hashtag._normalize_items(hashtag_data(range(25)))
+
+		assert not pool.called
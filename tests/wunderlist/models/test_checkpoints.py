@@ -0,0 +1,41 @@
+import pytest
+
+from wunderlist.models.base import INCOMPLETE_REVISION
+from wunderlist.models.root import Root
+
+class Interrupted(Exception):
+	pass
+
+@pytest.mark.usefixtures('database')
+class TestCheckpoints():
+
+	def test_revision_incomplete_while_children_sync(self, mocker):
+		revisions = []
+		mocker.patch.object(Root, '_sync_children', lambda self: revisions.append(Root.get().revision))
+
+		Root._perform_updates([], [{'id': 1, 'revision': 5}])
+
+		assert revisions == [INCOMPLETE_REVISION]
+		assert Root.get().revision == 5
+
+	def test_interrupted_sync_is_resumed(self, mocker):
+		sync_children = mocker.patch.object(Root, '_sync_children', side_effect=Interrupted)
+
+		with pytest.raises(Interrupted):
+			Root._perform_updates([], [{'id': 1, 'revision': 5}])
+
+		assert Root.get().revision == INCOMPLETE_REVISION
+
+		sync_children.side_effect = None
+		Root._perform_updates([Root.get()], [{'id': 1, 'revision': 5}])
+
+		assert sync_children.call_count == 2
+		assert Root.get().revision == 5
+
+	def test_completed_sync_is_not_repeated(self, mocker):
+		sync_children = mocker.patch.object(Root, '_sync_children')
+
+		Root._perform_updates([], [{'id': 1, 'revision': 5}])
+		Root._perform_updates([Root.get()], [{'id': 1, 'revision': 5}])
+
+		assert sync_children.call_count == 1
@@ -0,0 +1,34 @@
+from dateutil import parser
+import pytest
+
+from wunderlist.models.fields import parse_datetime
+
+class TestParseDatetime():
+
+	@pytest.mark.parametrize('value', [
+		'2016-01-02T12:34:56.789Z',
+		'2016-12-31T23:59:59.000Z',
+		'2016-01-02T12:34:56Z',
+		'2016-02-29'
+	])
+	def test_same_as_dateutil(self, value):
+		parsed = parse_datetime(value)
+
+		assert parsed == parser.parse(value)
+		assert parsed.utcoffset() == parser.parse(value).utcoffset()
+
+	@pytest.mark.parametrize('value', [
+		'2016-01-02T12:34:56+02:00',
+		'2016-01-02T12:34:56.789123Z',
+		'2016-01-02 12:34:56',
+		'Jan 2 2016'
+	])
+	def test_other_formats_left_to_dateutil(self, value):
+		assert parse_datetime(value) == parser.parse(value)
+
+	def test_invalid_dates_left_to_dateutil(self, mocker):
+		parse = mocker.patch('dateutil.parser.parse')
+
+		parse_datetime('2016-02-30')
+
+		assert parse.called
@@ -0,0 +1,265 @@
+from datetime import date, datetime
+
+import pytest
+from requests import ConnectionError
+
+from wunderlist.api import deadline
+import wunderlist.api.tasks
+from wunderlist.models.list import List
+from wunderlist.models.mutation import (Mutation, CREATE_NOTE,
+                                        CREATE_REMINDER, CREATE_TASK,
+                                        DELETE_TASK, UPDATE_TASK, MAX_ATTEMPTS)
+from wunderlist.models.root import Root
+from wunderlist.models.task import Task
+
+_task_id = 1234
+
+@pytest.fixture(autouse=True)
+def outbox(database, mocker):
+	"""
+	Keeps the outbox and the tasks it changes in an in-memory database
+	"""
+	mocker.patch('wunderlist.sync.invalidate_revision')
+
+@pytest.fixture()
+def mock_tasks(mocker):
+	mocker.patch('workflow.notify.notify')
+
+	return mocker.patch('wunderlist.api.tasks')
+
+def task_data(id, revision, **kwargs):
+	data = {
+		'id': id,
+		'revision': revision,
+		'list_id': 1,
+		'title': 'Task',
+		'created_at': '2016-01-01T12:00:00.000Z'
+	}
+	data.update(kwargs)
+
+	return data
+
+def create_local_task(**kwargs):
+	values = dict(id=_task_id, list=1, title='Task', revision=1, created_at=datetime.utcnow())
+	values.update(kwargs)
+
+	return Task.create(**values)
+
+def complete(completed=True, revision=1):
+	return Mutation.enqueue(UPDATE_TASK, _task_id,
+	                        revision=revision,
+	                        changes={'completed': completed, 'due_date': None},
+	                        previous={'completed': not completed, 'due_date': None})
+
+class TestCoalescing():
+
+	def test_enqueue(self):
+		complete()
+
+		mutation = Mutation.pending().get()
+
+		assert mutation.action == UPDATE_TASK
+		assert mutation.params['changes'] == {'completed': True}
+
+	def test_toggling_twice_cancels_out(self):
+		complete()
+		complete(False)
+
+		assert Mutation.pending().count() == 0
+
+	def test_updates_are_merged(self):
+		complete()
+		Mutation.enqueue(UPDATE_TASK, _task_id, revision=1,
+		                 changes={'due_date': date(2016, 1, 1)},
+		                 previous={'due_date': None})
+
+		mutation = Mutation.pending().get()
+
+		assert mutation.params['revision'] == 1
+		assert mutation.params['changes'] == {'completed': True, 'due_date': date(2016, 1, 1)}
+
+	def test_delete_replaces_updates(self):
+		complete()
+		Mutation.enqueue(DELETE_TASK, _task_id, revision=1)
+
+		assert [m.action for m in Mutation.pending()] == [DELETE_TASK]
+
+class TestFlush():
+
+	def test_sent_in_order(self, mock_tasks):
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='first')
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='second')
+
+		assert Mutation.flush() == 2
+		assert [c[1]['title'] for c in mock_tasks.create_task.call_args_list] == ['first', 'second']
+		assert Mutation.pending().count() == 0
+
+	def test_network_error_stops_flush(self, mock_tasks):
+		mock_tasks.create_task.side_effect = ConnectionError()
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='first')
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='second')
+
+		assert Mutation.flush() == 0
+		assert mock_tasks.create_task.call_count == 1
+		assert Mutation.pending().first().attempts == 1
+
+	def test_abandoned_after_max_attempts(self, mock_tasks):
+		mock_tasks.create_task.side_effect = ConnectionError()
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='first')
+
+		for _ in range(MAX_ATTEMPTS):
+			Mutation.flush()
+
+		assert Mutation.pending().count() == 0
+
+	def test_rejected_mutation_is_dropped(self, mock_tasks):
+		mock_tasks.delete_task.return_value = False
+		Mutation.enqueue(DELETE_TASK, _task_id, revision=1)
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='next')
+
+		assert Mutation.flush() == 1
+		assert Mutation.pending().count() == 0
+
+	def test_not_created_within_deadline(self, mock_tasks):
+		create_local_task()
+		complete()
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='first')
+
+		with deadline.budget(3):
+			assert Mutation.flush() == 1
+
+		assert not mock_tasks.create_task.called
+		assert [m.action for m in Mutation.pending()] == [CREATE_TASK]
+
+class TestCreateTask():
+
+	@pytest.fixture()
+	def mock_api(self, mocker, mock_tasks):
+		mock_tasks.create_task.return_value = task_data(99, 5, title='first')
+
+		return (mock_tasks, mocker.patch('wunderlist.api.reminders'), mocker.patch('wunderlist.api.notes'))
+
+	def enqueue(self):
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='first',
+		                 reminder_date=datetime(2016, 1, 1, 9), note='Details')
+
+	def test_reminder_and_note_queued_separately(self, mock_api):
+		self.enqueue()
+
+		assert [m.action for m in Mutation.pending()] == [CREATE_TASK, CREATE_REMINDER, CREATE_NOTE]
+		assert 'note' not in Mutation.pending().first().params
+
+	def test_reminder_and_note_added_to_new_task(self, mock_api):
+		(tasks, reminders, notes) = mock_api
+		self.enqueue()
+
+		assert Mutation.flush() == 3
+		assert reminders.create_reminder.call_args[0] == (99, datetime(2016, 1, 1, 9))
+		assert notes.create_note.call_args[0] == (99, 'Details')
+
+	def test_task_not_created_again_after_failure(self, mock_api):
+		(tasks, reminders, notes) = mock_api
+		reminders.create_reminder.side_effect = ConnectionError()
+		self.enqueue()
+
+		Mutation.flush()
+		Mutation.flush()
+
+		assert tasks.create_task.call_count == 1
+		assert [(m.action, m.target_id) for m in Mutation.pending()] == [(CREATE_REMINDER, 99), (CREATE_NOTE, 99)]
+
+	def test_deleted_task_is_not_given_a_note(self, mock_api):
+		Mutation.enqueue(CREATE_NOTE, _task_id, content='Details')
+		Mutation.enqueue(DELETE_TASK, _task_id, revision=1)
+
+		assert [m.action for m in Mutation.pending()] == [DELETE_TASK]
+
+class TestLocalChanges():
+
+	def test_created_task_has_temporary_id(self):
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='first')
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='second')
+
+		assert [(t.id, t.title) for t in Task.select().order_by(Task.id.desc())] == [(-1, 'first'), (-2, 'second')]
+
+	def test_completed_locally(self):
+		create_local_task()
+		complete()
+
+		assert Task.get(Task.id == _task_id).completed
+
+	def test_toggled_back_locally(self):
+		create_local_task()
+		complete()
+		complete(False)
+
+		assert Mutation.pending().count() == 0
+		assert not Task.get(Task.id == _task_id).completed
+
+	def test_deleted_locally(self):
+		create_local_task()
+		Mutation.enqueue(DELETE_TASK, _task_id, revision=1)
+
+		assert Task.select().count() == 0
+
+	def test_temporary_id_replaced(self, mock_tasks):
+		mock_tasks.create_task.return_value = task_data(99, 5, title='first')
+		Mutation.enqueue(CREATE_TASK, list_id=1, title='first')
+
+		Mutation.flush()
+
+		task = Task.get()
+
+		assert (task.id, task.revision) == (99, 5)
+
+	def test_completing_unsent_task_changes_create(self, mock_tasks):
+		mutation = Mutation.enqueue(CREATE_TASK, list_id=1, title='first')
+		Mutation.enqueue(UPDATE_TASK, mutation.target_id, revision=0,
+		                 changes={'completed': True}, previous={'completed': False})
+
+		assert Mutation.pending().count() == 1
+		assert Task.get().completed
+
+		Mutation.flush()
+
+		assert mock_tasks.create_task.call_args[1]['completed'] is True
+
+	def test_deleting_unsent_task_cancels_create(self, mock_tasks):
+		mutation = Mutation.enqueue(CREATE_TASK, list_id=1, title='first')
+		Mutation.enqueue(DELETE_TASK, mutation.target_id, revision=0)
+
+		assert Mutation.pending().count() == 0
+		assert Task.select().count() == 0
+
+	def test_updated_from_response(self, mock_tasks):
+		mock_tasks.update_task.return_value = task_data(_task_id, 2, completed_at='2016-01-02T12:00:00.000Z')
+		create_local_task()
+		complete()
+
+		Mutation.flush()
+
+		task = Task.get()
+
+		assert task.revision == 2
+		assert task.completed_at.day == 2
+
+	def test_rejected_update_is_refreshed_by_sync(self, mock_tasks):
+		mock_tasks.update_task.return_value = {'error': 'conflict'}
+		create_local_task()
+		complete()
+
+		List.create(id=1, title='List', list_type='list', public=False, order=0, revision=3, created_at=datetime.utcnow())
+		Root.create(id=1, revision=7)
+
+		Mutation.flush()
+
+		assert Task.get().revision == 0
+		assert List.get().revision == 0
+		assert Root.get().revision == 0
+
+	def test_enqueue_invalidates_root_revision(self):
+		import wunderlist.sync
+
+		complete()
+
+		assert wunderlist.sync.invalidate_revision.called
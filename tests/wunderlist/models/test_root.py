@@ -0,0 +1,41 @@
+import pytest
+
+from wunderlist.models.hashtag import Hashtag
+from wunderlist.models.list import List
+from wunderlist.models.preferences import Preferences
+from wunderlist.models.reminder import Reminder
+from wunderlist.models.root import Root
+from wunderlist.models.user import User
+
+@pytest.fixture()
+def mock_children(mocker):
+	"""
+	Replaces the requests and updates of every stage of the sync
+	"""
+	mocker.patch('wunderlist.api.user.user', return_value={'id': 1, 'revision': 2})
+	mocker.patch('wunderlist.api.lists.lists', return_value=[])
+	mocker.patch.object(Preferences, 'sync')
+	mocker.patch.object(User, 'sync')
+	mocker.patch.object(Hashtag, 'sync')
+	mocker.patch.object(Reminder, 'sync')
+
+	return mocker.patch.object(List, 'sync')
+
+@pytest.mark.usefixtures('database')
+class TestSyncChildren():
+
+	def test_reminders_synced_when_no_list_changed(self, mock_children):
+		mock_children.return_value = []
+
+		Root(id=1, revision=1)._sync_children()
+
+		assert Reminder.sync.call_count == 1
+		assert User.sync.call_count == 1
+
+	def test_reminders_saved_with_changed_lists(self, mock_children):
+		mock_children.return_value = [List(id=1)]
+
+		Root(id=1, revision=1)._sync_children()
+
+		assert Reminder.sync.call_count == 0
+		assert User.sync.call_count == 1
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from wunderlist.models.sync_graph import Stage, SyncGraph, SKIPPED
+
+def constant(value):
+	return lambda results: value
+
+class TestSyncGraph():
+
+	def test_results_of_requirements(self):
+		results = SyncGraph([
+			Stage('sum', lambda results: results['a'] + results['b'], requires=['a', 'b']),
+			Stage('a', constant(1)),
+			Stage('b', constant(2), writer=True)
+		]).run()
+
+		assert results == {'a': 1, 'b': 2, 'sum': 3}
+
+	def test_independent_stages_overlap(self):
+		a_started = threading.Event()
+		b_started = threading.Event()
+
+		def a(results):
+			a_started.set()
+			return b_started.wait(1)
+
+		def b(results):
+			b_started.set()
+			return a_started.wait(1)
+
+		results = SyncGraph([Stage('a', a), Stage('b', b)]).run()
+
+		assert results == {'a': True, 'b': True}
+
+	def test_writers_run_on_calling_thread(self):
+		threads = {}
+
+		def record(name):
+			def function(results):
+				threads[name] = threading.current_thread()
+			return function
+
+		SyncGraph([
+			Stage('fetch', record('fetch')),
+			Stage('write', record('write'), requires=['fetch'], writer=True)
+		]).run()
+
+		assert threads['write'] == threading.current_thread()
+		assert threads['fetch'] != threading.current_thread()
+
+	def test_skip_propagates(self):
+		results = SyncGraph([
+			Stage('a', constant(1)),
+			Stage('b', constant(2), requires=['a'], skip=lambda results: results['a'] == 1),
+			Stage('c', constant(3), requires=['b'], writer=True)
+		]).run()
+
+		assert results == {'a': 1, 'b': SKIPPED, 'c': SKIPPED}
+
+	def test_pool_error_is_raised(self):
+		def fail(results):
+			raise ValueError('failed')
+
+		graph = SyncGraph([
+			Stage('a', fail),
+			Stage('b', constant(2), requires=['a'], writer=True)
+		])
+
+		with pytest.raises(ValueError):
+			graph.run()
+
+		assert 'b' not in graph.results
+
+	def test_unknown_requirement(self):
+		with pytest.raises(ValueError):
+			SyncGraph([Stage('a', constant(1), requires=['missing'])])
@@ -0,0 +1,442 @@
+from datetime import datetime
+import threading
+
+from concurrent.futures import Future
+from peewee import SqliteDatabase
+from playhouse.test_utils import test_database
+import pytest
+
+from wunderlist.models.list import List
+from wunderlist.models.reminder import Reminder
+from wunderlist.models.root import Root
+import wunderlist.models.task as task_module
+from wunderlist.models.task import Task
+from wunderlist.models.task_collection import (COMPLETED_TASKS,
+                                               CURRENT_SUBTASKS, POSITIONS,
+                                               RECENTLY_COMPLETED_TASKS,
+                                               REMINDERS, SUBTASK_POSITIONS,
+                                               SUBTASKS, TASKS, TaskCollection)
+
+class FakeList():
+
+	def __init__(self, id):
+		self.id = id
+
+	def __str__(self):
+		return '<FakeList %d>' % self.id
+
+	def checkpoint(self):
+		pass
+
+def completed_future(result):
+	future = Future()
+	future.set_result(result)
+
+	return future
+
+def mock_requests(mocker, requests):
+	"""
+	Replaces the requests for each list with the given futures
+	"""
+	def request(list):
+		return requests[list.id]
+
+	def tasks_in_list(list, positions_jobs, tasks_jobs, completed_since):
+		return (('', {}), [job.result() for job in tasks_jobs])
+
+	mocker.patch.object(TaskCollection, 'validators', return_value={})
+	mocker.patch.object(task_module.RevisionIndex, 'load', return_value=task_module.RevisionIndex())
+	mocker.patch.object(Task, '_completed_since', return_value=None)
+	mocker.patch.object(Task, '_request_tasks_in_list', side_effect=lambda list, validators, completed_since: request(list))
+	mocker.patch.object(Task, '_tasks_in_list', side_effect=tasks_in_list)
+	mocker.patch.object(Task, '_delete_orphaned_reminders')
+
+	return mocker.patch.object(Task, '_update_tasks_in_list')
+
+class TestSyncTasksInLists():
+
+	def test_all_lists_requested_before_waiting(self, mocker):
+		lists = [FakeList(id) for id in range(3)]
+		pending = Future()
+		requests = {
+			0: ([], [pending]),
+			1: ([], [completed_future(1)]),
+			2: ([], [completed_future(2)])
+		}
+		update = mock_requests(mocker, requests)
+
+		# The first list is not received until the others have been saved
+		def update_list(list, positions, collections, saved_positions_revision, index):
+			if update.call_count == 2:
+				pending.set_result(0)
+
+		update.side_effect = update_list
+
+		Task.sync_tasks_in_lists(lists)
+
+		saved = [c[0][2] for c in update.call_args_list]
+
+		assert sorted(saved[:2]) == [[1], [2]]
+		assert saved[2] == [0]
+
+	def test_list_saved_once_all_requests_complete(self, mocker):
+		lists = [FakeList(1)]
+		requests = {
+			1: ([completed_future([])], [completed_future('a'), completed_future('b')])
+		}
+		update = mock_requests(mocker, requests)
+
+		Task.sync_tasks_in_lists(lists)
+
+		assert update.call_count == 1
+		assert update.call_args[0][2] == ['a', 'b']
+
+	def test_updates_are_written_by_calling_thread(self, mocker):
+		lists = [FakeList(id) for id in range(5)]
+		requests = dict((list.id, ([], [completed_future(list.id)])) for list in lists)
+		writers = set()
+		update = mock_requests(mocker, requests)
+		update.side_effect = lambda *args, **kwargs: writers.add(threading.current_thread())
+
+		Task.sync_tasks_in_lists(lists)
+
+		assert writers == set([threading.current_thread()])
+
+	def test_orphaned_reminders_deleted_once(self, mocker):
+		lists = [FakeList(id) for id in range(3)]
+		requests = dict((list.id, ([], [completed_future(list.id)])) for list in lists)
+		mock_requests(mocker, requests)
+
+		Task.sync_tasks_in_lists(lists)
+
+		assert Task._delete_orphaned_reminders.call_count == 1
+
+	def test_remaining_requests_cancelled_on_failure(self, mocker):
+		from wunderlist.api.deadline import DeadlineExceeded
+
+		lists = [FakeList(id) for id in range(2)]
+		pending = Future()
+		requests = {
+			0: ([], [completed_future(0)]),
+			1: ([], [pending])
+		}
+		update = mock_requests(mocker, requests)
+		update.side_effect = DeadlineExceeded()
+
+		with pytest.raises(DeadlineExceeded):
+			Task.sync_tasks_in_lists(lists)
+
+		assert pending.cancelled()
+
+@pytest.fixture()
+def database(database):
+	"""
+	The list whose tasks are saved
+	"""
+	return List.create(id=1, title='List', list_type='list', public=False, order=0, revision=1, created_at=datetime.utcnow())
+
+def task_data(id, revision=1, **kwargs):
+	data = {
+		'id': id,
+		'revision': revision,
+		'list_id': 1,
+		'title': 'Task %d' % id,
+		'created_at': '2016-01-01T12:00:00.000Z'
+	}
+	data.update(kwargs)
+
+	return data
+
+@pytest.mark.usefixtures('database')
+class TestUpdateTasksInList():
+
+	def sync(self, list, tasks=None, completed_tasks=None, subtasks=None, positions=()):
+		collections = [
+			(TASKS, '"tasks"', tasks),
+			(COMPLETED_TASKS, '"completed"', completed_tasks),
+			(SUBTASKS, '"subtasks"', subtasks)
+		]
+		positions_revision = ','.join(str(id) for id in positions)
+		position_by_task_id = dict((id, index) for (index, id) in enumerate(positions))
+		saved_positions_revision = TaskCollection.validators([list.id]).get((list.id, POSITIONS))
+
+		Task._update_tasks_in_list(list, (positions_revision, position_by_task_id), collections, saved_positions_revision)
+
+	def test_unchanged_collections_are_kept(self, database):
+		self.sync(database, [task_data(1)], [task_data(2, completed_at='2016-01-02T12:00:00.000Z')], [])
+		self.sync(database, [task_data(1, 2, title='Changed')])
+
+		assert sorted((t.id, t.title) for t in Task.select()) == [(1, 'Changed'), (2, 'Task 2')]
+
+	def test_removed_from_changed_collection(self, database):
+		self.sync(database, [task_data(1), task_data(3)], [task_data(2, completed_at='2016-01-02T12:00:00.000Z')], [])
+		self.sync(database, [task_data(1)])
+
+		assert sorted(t.id for t in Task.select()) == [1, 2]
+
+	def test_validators_saved_for_changed_collections(self, database):
+		self.sync(database, [task_data(1)], [], [])
+		self.sync(database, [task_data(1)])
+
+		assert TaskCollection.validators([1]) == {
+			(1, TASKS): '"tasks"',
+			(1, COMPLETED_TASKS): '"completed"',
+			(1, SUBTASKS): '"subtasks"',
+			(1, CURRENT_SUBTASKS): '1'
+		}
+
+	def test_unchanged_tasks_are_reordered(self, database):
+		self.sync(database, [], [task_data(1, completed_at='2016-01-02T12:00:00.000Z')], [], positions=[1])
+		self.sync(database, [], positions=[5, 1])
+
+		assert Task.get(Task.id == 1).order == 1
+
+	def test_unchanged_tasks_in_changed_collection_are_reordered(self, database):
+		self.sync(database, [task_data(2), task_data(4)], [], [], positions=[2, 4])
+		self.sync(database, [task_data(5), task_data(2), task_data(4)], positions=[5, 2, 4])
+
+		assert [(t.id, t.order) for t in Task.select().order_by(Task.id)] == [(2, 1), (4, 2), (5, 0)]
+
+	def test_positions_revision_saved(self, database):
+		self.sync(database, [task_data(1)], [], [], positions=[1])
+
+		assert TaskCollection.validators([1])[(1, POSITIONS)] == '1'
+
+	def test_unchanged_positions_do_not_reorder(self, database):
+		self.sync(database, [], [task_data(1, completed_at='2016-01-02T12:00:00.000Z')], [], positions=[5, 1])
+		Task.update(order=7).where(Task.id == 1).execute()
+		self.sync(database, [], positions=[5, 1])
+
+		assert Task.get(Task.id == 1).order == 7
+
+class TestCompletedTasksWindow():
+
+	def test_tasks_completed_before_window_are_left_out(self, mocker):
+		mocker.patch('wunderlist.models.task._synced_collections', return_value=task_module._collections)
+		mocker.patch('wunderlist.api.tasks.task_positions', return_value=('', {}))
+		jobs = [
+			completed_future(('"tasks"', [])),
+			completed_future(('"completed"', [
+				task_data(1, completed_at='2016-01-02T12:00:00.000Z'),
+				task_data(2, completed_at='2016-03-02T12:00:00.000Z')
+			])),
+			completed_future(('"subtasks"', []))
+		]
+
+		(positions, collections) = Task._tasks_in_list(FakeList(1), [], jobs, '2016-02-01T00:00:00')
+
+		assert collections[1][0] == RECENTLY_COMPLETED_TASKS
+		assert [task['id'] for task in collections[1][2]] == [2]
+
+	def test_saved_completed_tasks_include_window(self, mocker):
+		request = mocker.patch('wunderlist.api.tasks.request_tasks')
+		mocker.patch('wunderlist.api.tasks.request_task_positions', return_value=[])
+
+		Task._request_tasks_in_list(FakeList(1), {(1, COMPLETED_TASKS): '"completed"'}, '2016-02-01T00:00:00')
+
+		assert request.call_args_list[1][1]['saved_validator'] == '"completed"'
+
+	@pytest.mark.usefixtures('database')
+	def test_recent_collection_replaces_completed(self, database):
+		TestUpdateTasksInList().sync(database, [], [], [])
+		Task._update_tasks_in_list(database, ('', {}), [(RECENTLY_COMPLETED_TASKS, '"recent"', [])])
+
+		validators = TaskCollection.validators([1])
+
+		assert validators[(1, RECENTLY_COMPLETED_TASKS)] == '"recent"'
+		assert (1, COMPLETED_TASKS) not in validators
+
+	@pytest.mark.usefixtures('database')
+	def test_window_recorded_without_validator(self, database):
+		Task._update_tasks_in_list(database, ('', {}), [(RECENTLY_COMPLETED_TASKS, None, [])])
+
+		assert (1, RECENTLY_COMPLETED_TASKS) in TaskCollection.validators([1])
+
+	@pytest.mark.usefixtures('database')
+	def test_backfill_syncs_windowed_lists_again(self, database, mocker):
+		invalidate_revision = mocker.patch('wunderlist.sync.invalidate_revision')
+		Root.create(id=1, revision=5, user=None)
+		TaskCollection.save_validators(1, {RECENTLY_COMPLETED_TASKS: '"recent"', TASKS: '"tasks"'})
+
+		assert Task.backfill_completed_tasks()
+
+		assert TaskCollection.validators([1]) == {(1, TASKS): '"tasks"'}
+		assert List.get().revision == 0
+		assert Root.get().revision == 0
+		assert invalidate_revision.called
+
+	@pytest.mark.usefixtures('database')
+	def test_nothing_to_backfill(self, database, mocker):
+		invalidate_revision = mocker.patch('wunderlist.sync.invalidate_revision')
+
+		assert not Task.backfill_completed_tasks()
+		assert not invalidate_revision.called
+
+class TestSubtasks():
+
+	def test_subtasks_not_synced_with_list(self, mocker):
+		prefs = mocker.patch('wunderlist.models.preferences.Preferences.current_prefs').return_value
+		prefs.eager_subtask_sync = False
+
+		assert [kind for (kind, params) in task_module._synced_collections()] == [TASKS, COMPLETED_TASKS, REMINDERS]
+
+	def test_subtasks_synced_with_list_if_eager(self, mocker):
+		prefs = mocker.patch('wunderlist.models.preferences.Preferences.current_prefs').return_value
+		prefs.eager_subtask_sync = True
+
+		assert SUBTASKS in [kind for (kind, params) in task_module._synced_collections()]
+
+	@pytest.mark.usefixtures('database')
+	def test_list_sync_without_subtasks_makes_them_stale(self, database):
+		TaskCollection.save_validators(1, {CURRENT_SUBTASKS: '1'})
+
+		Task._update_tasks_in_list(database, ('', {}), [(TASKS, '"tasks"', [])])
+
+		assert (1, CURRENT_SUBTASKS) not in TaskCollection.validators([1])
+
+	@pytest.mark.usefixtures('database')
+	def test_current_subtasks_are_not_retrieved(self, database, mocker):
+		request = mocker.patch('wunderlist.api.tasks.request_tasks')
+		TaskCollection.save_validators(1, {CURRENT_SUBTASKS: '1'})
+
+		assert not Task.sync_subtasks_in_list(database)
+		assert not request.called
+
+	@pytest.mark.usefixtures('database')
+	def test_stale_subtasks_are_retrieved(self, database, mocker):
+		subtask = task_data(2, task_id=1)
+		del subtask['list_id']
+		mocker.patch('wunderlist.api.tasks.request_subtask_positions', return_value=[])
+		mocker.patch('wunderlist.api.tasks.task_positions', return_value=('1:1', {2: 0}))
+		mocker.patch('wunderlist.api.tasks.request_tasks', return_value=completed_future(('"subtasks"', [subtask])))
+		Task._update_tasks_in_list(database, ('1', {1: 0}), [(TASKS, '"tasks"', [task_data(1)])])
+
+		assert Task.sync_subtasks_in_list(database)
+
+		validators = TaskCollection.validators([1])
+
+		assert Task.get(Task.id == 2).task_id == 1
+		assert Task.get(Task.id == 2).order == 0
+		assert validators[(1, SUBTASKS)] == '"subtasks"'
+		assert validators[(1, SUBTASK_POSITIONS)] == '1:1'
+		assert validators[(1, POSITIONS)] == '1'
+		assert (1, CURRENT_SUBTASKS) in validators
+
+def reminder_data(id, task_id, revision=1):
+	return {
+		'id': id,
+		'task_id': task_id,
+		'revision': revision,
+		'date': '2016-01-03T12:00:00.000Z',
+		'created_at': '2016-01-01T12:00:00.000Z'
+	}
+
+@pytest.mark.usefixtures('database')
+class TestRemindersInList():
+
+	def sync(self, list, tasks, reminders):
+		Task._update_tasks_in_list(list, ('', {}), [
+			(TASKS, '"tasks"', tasks),
+			(REMINDERS, '"reminders"', reminders)
+		])
+
+	def test_reminders_saved_with_tasks(self, database):
+		self.sync(database, [task_data(1)], [reminder_data(10, 1)])
+
+		assert [(r.id, r.task_id) for r in Reminder.select()] == [(10, 1)]
+		assert TaskCollection.validators([1])[(1, REMINDERS)] == '"reminders"'
+
+	def test_reminders_of_unsaved_tasks_are_left_out(self, database):
+		self.sync(database, [task_data(1)], [reminder_data(10, 1), reminder_data(11, 2)])
+
+		assert [r.id for r in Reminder.select()] == [10]
+
+	def test_reminders_of_deleted_tasks_are_removed(self, database):
+		self.sync(database, [task_data(1), task_data(2)], [reminder_data(10, 1), reminder_data(11, 2)])
+		self.sync(database, [task_data(1)], [reminder_data(10, 1)])
+		Task._delete_orphaned_reminders()
+
+		assert [r.id for r in Reminder.select()] == [10]
+
+	def test_unchanged_reminders_are_kept(self, database):
+		self.sync(database, [task_data(1)], [reminder_data(10, 1)])
+		self.sync(database, [task_data(1, 2)], None)
+
+		assert [r.id for r in Reminder.select()] == [10]
+
+@pytest.mark.usefixtures('database')
+class TestRevisionIndex():
+
+	def sync(self, list, tasks, index):
+		Task._update_tasks_in_list(list, ('', {}), [(TASKS, '"%d"' % list.id, tasks)], index=index)
+
+	def other_list(self):
+		return List.create(id=2, title='Other', list_type='list', public=False, order=1, revision=1, created_at=datetime.utcnow())
+
+	def test_tasks_by_collection(self, database):
+		Task._update_tasks_in_list(database, ('', {}), [
+			(TASKS, '"tasks"', [task_data(1)]),
+			(COMPLETED_TASKS, '"completed"', [task_data(2, completed_at='2016-01-02T12:00:00.000Z')]),
+			(SUBTASKS, '"subtasks"', [task_data(3, task_id=1)])
+		])
+		index = task_module.RevisionIndex.load()
+
+		assert index.in_collections(1, [TASKS]) == [1]
+		assert index.in_collections(1, [COMPLETED_TASKS]) == [2]
+		assert index.in_collections(1, [SUBTASKS]) == [3]
+		assert index.revision(3) == 1
+
+	def test_empty_before_first_sync(self):
+		with test_database(SqliteDatabase(':memory:'), [Task], create_tables=False, drop_tables=False):
+			assert task_module.RevisionIndex.load().tasks == {}
+
+	def test_unsent_tasks_are_left_out(self, database):
+		self.sync(database, [task_data(-1), task_data(1)], task_module.RevisionIndex())
+
+		assert task_module.RevisionIndex.load().in_collections(1, [TASKS]) == [1]
+
+	def test_task_moved_to_list_saved_earlier(self, database):
+		other_list = self.other_list()
+		self.sync(database, [task_data(1)], None)
+		index = task_module.RevisionIndex.load()
+
+		self.sync(other_list, [task_data(1, 2, list_id=2)], index)
+		self.sync(database, [], index)
+
+		assert [(t.id, t.list_id) for t in Task.select()] == [(1, 2)]
+
+	def test_task_moved_to_list_saved_later(self, database):
+		other_list = self.other_list()
+		self.sync(database, [task_data(1)], None)
+		index = task_module.RevisionIndex.load()
+
+		self.sync(database, [], index)
+		self.sync(other_list, [task_data(1, 2, list_id=2)], index)
+
+		assert [(t.id, t.list_id) for t in Task.select()] == [(1, 2)]
+		assert index.in_collections(2, [TASKS]) == [1]
+
+@pytest.mark.usefixtures('database')
+class TestListCheckpoint():
+
+	def test_list_revision_saved_with_its_tasks(self, database, mocker):
+		mocker.patch.object(Task, '_request_tasks_in_list', return_value=([], [completed_future(None)]))
+		mocker.patch.object(Task, '_tasks_in_list', return_value=(('', {}), []))
+		mocker.patch.object(Task, '_completed_since', return_value=None)
+		database._checkpoint_revision = 2
+
+		Task.sync_tasks_in_lists([database])
+
+		assert List.get().revision == 2
+
+	def test_list_incomplete_if_tasks_fail(self, database, mocker):
+		mocker.patch.object(Task, '_request_tasks_in_list', return_value=([], [completed_future(None)]))
+		mocker.patch.object(Task, '_tasks_in_list', side_effect=ValueError)
+		mocker.patch.object(Task, '_completed_since', return_value=None)
+		List.update(revision=0).execute()
+		database._checkpoint_revision = 2
+
+		with pytest.raises(ValueError):
+			Task.sync_tasks_in_lists([database])
+
+		assert List.get().revision == 0
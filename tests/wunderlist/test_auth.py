@@ -0,0 +1,68 @@
+import os
+import stat
+
+import pytest
+from workflow import PasswordNotFound
+
+from wunderlist import auth
+
+_token = 'abc123'
+
+@pytest.fixture(autouse=True)
+def memory_cache(request):
+	"""
+	Avoids persisting tokens between tests
+	"""
+	cache = auth.MemoryTokenCache()
+	auth.set_token_cache(cache)
+
+	request.addfinalizer(lambda: auth.set_token_cache(None))
+
+	return cache
+
+@pytest.fixture()
+def keychain(mocker):
+	"""
+	Stands in for the Keychain, which is only available on OS X
+	"""
+	get_password = mocker.patch('wunderlist.util.Workflow.get_password', return_value=_token)
+	mocker.patch('wunderlist.util.Workflow.delete_password')
+
+	return get_password
+
+class TestTokenCache():
+
+	def test_token_is_cached(self, keychain):
+		assert auth.oauth_token() == _token
+		assert auth.oauth_token() == _token
+		assert keychain.call_count == 1
+
+	def test_missing_token(self, keychain):
+		keychain.side_effect = PasswordNotFound()
+
+		assert auth.oauth_token() is None
+		assert not auth.is_authorized()
+
+	def test_invalidate(self, keychain):
+		auth.oauth_token()
+		auth.invalidate_token_cache()
+		auth.oauth_token()
+
+		assert keychain.call_count == 2
+
+	def test_deauthorize_clears_cache(self, keychain, memory_cache):
+		auth.oauth_token()
+		auth.deauthorize()
+
+		assert memory_cache.get() is None
+
+	def test_file_cache_is_private(self, tmpdir):
+		cache = auth.FileTokenCache(str(tmpdir.join('token')))
+		cache.set(_token)
+
+		assert cache.get() == _token
+		assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0600
+
+		cache.clear()
+
+		assert cache.get() is None
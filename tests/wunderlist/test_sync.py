@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+import os
+
+import pytest
+
+from wunderlist.models.mutation import Mutation
+from wunderlist.models.root import Root
+import wunderlist.sync
+from wunderlist.sync import (invalidate_revision, last_sync, sync,
+                             _store_revision, _sync)
+
+@pytest.fixture(autouse=True)
+def files(mocker, tmpdir):
+	"""
+	Keeps the revision and database files in a temporary directory
+	"""
+	database = tmpdir.join('wunderlist.db')
+	database.write('')
+
+	mocker.patch('wunderlist.sync._revision_file', return_value=str(tmpdir.join('root_revision')))
+	mocker.patch('wunderlist.sync._initial_sync_file', return_value=str(tmpdir.join('initial_sync')))
+	mocker.patch('wunderlist.sync.workflow').return_value.datafile.return_value = str(database)
+	mocker.patch('wunderlist.sync.circuit.is_open', return_value=False)
+	mocker.patch('wunderlist.sync.circuit.state', return_value='closed')
+
+	return tmpdir
+
+@pytest.fixture()
+def root(mocker):
+	return mocker.patch('wunderlist.api.root.root', return_value={'id': 1, 'revision': 10})
+
+@pytest.fixture()
+def full_sync(mocker):
+	return mocker.patch('wunderlist.sync._sync', return_value=True)
+
+class TestFastPath():
+
+	def test_unchanged_revision_skips_sync(self, root, full_sync):
+		_store_revision(10)
+
+		assert sync(background=True)
+		assert root.call_count == 1
+		assert not full_sync.called
+
+	def test_changed_revision_syncs_with_root(self, root, full_sync):
+		_store_revision(9)
+
+		sync(background=True)
+
+		full_sync.assert_called_once_with(True, {'id': 1, 'revision': 10})
+
+	def test_invalidated_revision_syncs_without_probe(self, root, full_sync):
+		_store_revision(10)
+		invalidate_revision()
+
+		sync(background=True)
+
+		assert not root.called
+		full_sync.assert_called_once_with(True, None)
+
+	def test_missing_database_syncs(self, root, full_sync, files):
+		_store_revision(10)
+		files.join('wunderlist.db').remove()
+
+		sync(background=True)
+
+		assert full_sync.called
+
+class TestLastSync():
+
+	def test_includes_fast_path_check(self, mocker, root, full_sync):
+		prefs = mocker.patch('wunderlist.sync.Preferences.current_prefs').return_value
+		prefs.last_sync = datetime.now() - timedelta(hours=1)
+		_store_revision(10)
+		os.utime(wunderlist.sync._revision_file(), (0, 0))
+
+		sync(background=True)
+
+		assert datetime.now() - last_sync() < timedelta(seconds=5)
+
+@pytest.mark.usefixtures('database')
+class TestInitialSync():
+
+	@pytest.fixture(autouse=True)
+	def notify(self, mocker):
+		mocker.patch('wunderlist.sync.Preferences.current_prefs')
+		mocker.patch.object(Mutation, 'flush', return_value=0)
+
+		return mocker.patch('wunderlist.sync.notify')
+
+	def complete_root_sync(self, mocker, revision=10):
+		def sync_root(**kwargs):
+			Root.delete().execute()
+			Root.create(id=1, revision=revision)
+
+		mocker.patch.object(Root, 'sync', side_effect=sync_root)
+
+	def test_notified_after_initial_sync(self, mocker, notify):
+		self.complete_root_sync(mocker)
+
+		_sync(True)
+
+		assert notify.call_args[0][0] == 'Initial sync has completed'
+
+	def test_interrupted_initial_sync_is_resumed(self, mocker, notify):
+		mocker.patch.object(Root, 'sync', side_effect=ValueError)
+
+		with pytest.raises(ValueError):
+			_sync(True)
+
+		Root.create(id=1, revision=0)
+		self.complete_root_sync(mocker)
+
+		_sync(True)
+
+		assert notify.call_args[0][0] == 'Initial sync has completed'
+
+	def test_not_notified_after_later_sync(self, mocker, notify):
+		self.complete_root_sync(mocker)
+		_sync(True)
+		notify.reset_mock()
+
+		# e.g. after a mutation was discarded
+		Root.update(revision=0).execute()
+
+		_sync(True)
+
+		assert not notify.called